@@ -62,15 +62,12 @@ class UseAbility(Action):
 class Build(Action):
     unit: Unit
     type_id: UnitTypeId
-    near: Point2
+    position: Point2
 
     async def execute(self, bot: AresBot) -> bool:
         logger.info(self)
         bot.mediator.assign_role(tag=self.unit.tag, role=UnitRole.PERSISTENT_BUILDER)
-        if placement := await bot.find_placement(self.type_id, near=self.near):
-            return self.unit.build(self.type_id, placement)
-        else:
-            return False
+        return self.unit.build(self.type_id, self.position)
 
 
 @dataclass
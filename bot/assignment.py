@@ -0,0 +1,47 @@
+import numpy as np
+
+
+class TargetAssignment:
+    """
+    Matches units to targets at minimum total cost, with at most ceil(units / targets) units per target.
+    Assignments from the previous call are kept while they stay within `slack` of the unit's best option,
+    so that only the remaining units are matched again.
+    """
+
+    def __init__(self, slack: float = 4.0) -> None:
+        # slow to import, so this is deferred until the bot is set up
+        from scipy.optimize import linear_sum_assignment
+
+        self._linear_sum_assignment = linear_sum_assignment
+        self.slack = slack
+        self.previous = dict[int, int]()
+
+    def assign(self, unit_tags: np.ndarray, target_tags: np.ndarray, cost: np.ndarray) -> np.ndarray:
+        """Index into target_tags for each unit, given the cost matrix of shape (units, targets)."""
+        n, m = cost.shape
+        assignment = np.full(n, -1)
+        if not n or not m:
+            self.previous.clear()
+            return assignment
+        capacity = -(-n // m)
+
+        # warm start
+        target_index = {t: j for j, t in enumerate(target_tags.tolist())}
+        best = cost.min(axis=1)
+        for i, tag in enumerate(unit_tags.tolist()):
+            if (j := target_index.get(self.previous.get(tag))) is not None and cost[i, j] <= best[i] + self.slack:
+                assignment[i] = j
+        load = np.bincount(assignment[0 <= assignment], minlength=m)
+        for j in np.flatnonzero(capacity < load):
+            kept = np.flatnonzero(assignment == j)
+            assignment[kept[np.argsort(cost[kept, j])[capacity:]]] = -1
+
+        if (free := np.flatnonzero(assignment < 0)).size:
+            # one column per free slot, there are at least as many as free units
+            remaining = capacity - np.bincount(assignment[0 <= assignment], minlength=m)
+            columns = np.repeat(np.arange(m), remaining)
+            rows, slots = self._linear_sum_assignment(cost[np.ix_(free, columns)])
+            assignment[free[rows]] = columns[slots]
+
+        self.previous = dict(zip(unit_tags.tolist(), target_tags[assignment].tolist()))
+        return assignment
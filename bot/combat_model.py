@@ -0,0 +1,93 @@
+import os
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Iterable, Sequence
+
+import numpy as np
+from ares.consts import EngagementResult
+from sc2.ids.unit_typeid import UnitTypeId
+from sc2.unit import Unit
+
+from .consts import DPS_OVERRIDE, NON_COMBAT_TYPES
+
+ENGAGEMENT_RESULTS = sorted(EngagementResult, key=lambda r: r.value)
+
+
+def combat_features(counts: np.ndarray, health: np.ndarray) -> np.ndarray:
+    """Model input from per side and unit type counts and health (incl. shields), both of shape (n, 2, types)."""
+    n = counts.shape[0]
+    return np.concatenate((counts.reshape(n, -1), health.reshape(n, -1)), axis=1).astype(np.float32)
+
+
+def to_engagement_result(result: np.ndarray) -> list[EngagementResult]:
+    """Map results in [-1, 1] onto the ordered EngagementResult scale."""
+    index = np.rint((np.clip(result, -1, 1) + 1) / 2 * (len(ENGAGEMENT_RESULTS) - 1)).astype(int)
+    return [ENGAGEMENT_RESULTS[i] for i in index]
+
+
+def is_bystander(unit: Unit) -> bool:
+    """Whether the unit does not take part in fights, such as overlords and structures without weapons."""
+    if unit.type_id in NON_COMBAT_TYPES:
+        return True
+    return unit.is_structure and not unit.can_attack and unit.type_id not in DPS_OVERRIDE
+
+
+@dataclass(frozen=True)
+class CombatModel:
+    """Multilayer perceptron exported from train_combat_model.py, evaluated in pure NumPy."""
+
+    unit_types: Sequence[UnitTypeId]
+    mean: np.ndarray
+    std: np.ndarray
+    weights: Sequence[np.ndarray]
+    biases: Sequence[np.ndarray]
+
+    @classmethod
+    def load(cls, path: str) -> "CombatModel | None":
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            num_layers = int(data["num_layers"])
+            return CombatModel(
+                unit_types=[UnitTypeId(t) for t in data["unit_types"]],
+                mean=data["mean"],
+                std=data["std"],
+                weights=[data[f"weight_{i}"] for i in range(num_layers)],
+                biases=[data[f"bias_{i}"] for i in range(num_layers)],
+            )
+
+    def supports(self, units: Iterable[Unit]) -> bool:
+        return all(u.type_id in self._index or is_bystander(u) for u in units)
+
+    def features(self, engagements: Sequence[tuple[Sequence[Unit], Sequence[Unit]]]) -> np.ndarray:
+        shape = (len(engagements), 2, len(self.unit_types))
+        counts = np.zeros(shape, dtype=np.float32)
+        health = np.zeros(shape, dtype=np.float32)
+        for row, sides in enumerate(engagements):
+            for side, units in enumerate(sides):
+                for unit in units:
+                    if (t := self._index.get(unit.type_id)) is None:
+                        continue
+                    i = row, side, t
+                    counts[i] += 1
+                    health[i] += unit.health + unit.shield
+        return combat_features(counts, health)
+
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        """Predicted result in [-1, 1] for each row, positive values favour the first side."""
+        x = (features - self.mean) / self.std
+        for weight, bias in zip(self.weights[:-1], self.biases[:-1]):
+            x = np.maximum(x @ weight + bias, 0.0)
+        x = x @ self.weights[-1] + self.biases[-1]
+        return np.tanh(x[:, 0])
+
+    def predict_engagements(
+        self, engagements: Sequence[tuple[Sequence[Unit], Sequence[Unit]]]
+    ) -> list[EngagementResult]:
+        if not engagements:
+            return []
+        return to_engagement_result(self.predict(self.features(engagements)))
+
+    @cached_property
+    def _index(self) -> dict[UnitTypeId, int]:
+        return {t: i for i, t in enumerate(self.unit_types)}
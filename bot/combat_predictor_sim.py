@@ -8,7 +8,18 @@ from ares import AresBot
 from ares.consts import EngagementResult
 from sc2.unit import Unit
 from sc2.units import Units
-from sklearn.metrics import pairwise_distances
+
+from .combat_model import CombatModel
+from .unit_stats import UnitStats
+
+# fights where one side is this many times stronger are decided without simulating them
+DECISIVE_STRENGTH_RATIO = 4.0
+
+
+def pairwise_distances(a: Sequence, b: Sequence | None = None) -> np.ndarray:
+    a = np.asarray(a, dtype=float)
+    b = a if b is None else np.asarray(b, dtype=float)
+    return np.linalg.norm(a[:, None, :] - b[None, :, :], axis=-1)
 
 
 def graph_components(adjacency_matrix: np.ndarray) -> Set[Sequence[int]]:
@@ -34,13 +45,27 @@ class CombatOutcome(Enum):
 class CombatPrediction:
     outcome: EngagementResult
     outcome_for: Mapping[int, EngagementResult]
+    engaged: bool = False
+    """Whether any of our units are in contact with the enemy."""
 
 
 class CombatPredictor:
-    def __init__(self, bot: AresBot, units: Units, enemy_units: Units):
+    def __init__(
+        self,
+        bot: AresBot,
+        units: Units,
+        enemy_units: Units,
+        model: CombatModel | None = None,
+        enemy_positions: np.ndarray | None = None,
+        stats: UnitStats | None = None,
+    ):
         self.bot = bot
         self.units = units
         self.enemy_units = enemy_units
+        # positions of enemies out of vision are extrapolated
+        self.enemy_positions = enemy_positions
+        self.model = model
+        self.stats = stats
         self.contact_range_internal = 6
         self.contact_range = 12
         self.prediction = self._predict()
@@ -59,10 +84,19 @@ class CombatPredictor:
             return CombatPrediction(EngagementResult.VICTORY_OVERWHELMING, {})
 
         positions = [u.position for u in self.units]
-        enemy_positions = [u.position for u in self.enemy_units]
+        enemy_positions = self.enemy_positions
+        if enemy_positions is None:
+            enemy_positions = [u.position for u in self.enemy_units]
         distance_matrix = pairwise_distances(positions, enemy_positions)
 
-        contact = np.where(distance_matrix < self.contact_range, 1, 0)
+        contact_distance = self.contact_range
+        if self.stats:
+            # long range units are in contact as soon as either side can shoot
+            reach = np.maximum(
+                self.stats.reach(self.units, self.enemy_units), self.stats.reach(self.enemy_units, self.units).T
+            )
+            contact_distance = np.maximum(contact_distance, reach)
+        contact = np.where(distance_matrix < contact_distance, 1, 0)
         contact_own = np.zeros((n, n))
         contact_enemy = np.where(pairwise_distances(enemy_positions) < self.contact_range_internal, 1, 0)
 
@@ -73,14 +107,21 @@ class CombatPredictor:
             good_positioning=False,
             workers_do_no_damage=False,
         )
-        outcome = self.bot.mediator.can_win_fight(
-            own_units=self.units,
-            enemy_units=self.enemy_units,
-            timing_adjust=False,
-            **simulator_kwargs
-        )
-
+        if (decisive := self._decisive(self.units, self.enemy_units)) is not None:
+            outcome = decisive
+        elif self.model and self.model.supports(units):
+            outcome = self.model.predict_engagements([(self.units, self.enemy_units)])[0]
+        else:
+            outcome = self.bot.mediator.can_win_fight(
+                own_units=self.units,
+                enemy_units=self.enemy_units,
+                timing_adjust=False,
+                **simulator_kwargs
+            )
+
+        engaged = False
         outcome_for = dict[int, EngagementResult]()
+        engagements = list[tuple[list[Unit], list[Unit]]]()
         for component in components:
             local_units = [units[i] for i in component]
             local_own = list(filter(lambda u: u.is_mine, local_units))
@@ -89,7 +130,16 @@ class CombatPredictor:
                 local_outcome = EngagementResult.LOSS_OVERWHELMING if any(local_enemies) else EngagementResult.TIE
             elif not any(local_enemies):
                 local_outcome = EngagementResult.VICTORY_OVERWHELMING
+            elif (decisive := self._decisive(local_own, local_enemies)) is not None:
+                engaged = True
+                local_outcome = decisive
+            elif self.model and self.model.supports(local_units):
+                # scored below in a single batch
+                engaged = True
+                engagements.append((local_own, local_enemies))
+                continue
             else:
+                engaged = True
                 local_outcome = self.bot.mediator.can_win_fight(
                     own_units=local_own,
                     enemy_units=local_enemies,
@@ -100,4 +150,20 @@ class CombatPredictor:
             for u in local_own:
                 outcome_for[u.tag] = local_outcome
 
-        return CombatPrediction(outcome, outcome_for)
+        if self.model:
+            for (local_own, _), local_outcome in zip(engagements, self.model.predict_engagements(engagements)):
+                for u in local_own:
+                    outcome_for[u.tag] = local_outcome
+
+        return CombatPrediction(outcome, outcome_for, engaged)
+
+    def _decisive(self, units: Sequence[Unit], enemy_units: Sequence[Unit]) -> EngagementResult | None:
+        if not self.stats:
+            return None
+        strength = self.stats.strength(units, enemy_units)
+        enemy_strength = self.stats.strength(enemy_units, units)
+        if DECISIVE_STRENGTH_RATIO * enemy_strength < strength:
+            return EngagementResult.VICTORY_OVERWHELMING
+        elif DECISIVE_STRENGTH_RATIO * strength < enemy_strength:
+            return EngagementResult.LOSS_OVERWHELMING
+        return None
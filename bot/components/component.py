@@ -1,5 +1,10 @@
+from functools import cached_property
+
 from ares import AresBot
+from sc2.position import Point2
 
 
 class Component(AresBot):
-    pass
+    @cached_property
+    def tech_building_position(self) -> Point2:
+        return self.start_location.towards(self.game_info.map_center, 8)
@@ -1,7 +1,8 @@
-from functools import cached_property
+from collections import Counter
+from dataclasses import dataclass, field
 from typing import Iterable
 
-from ares.consts import ALL_STRUCTURES
+from ares.consts import ALL_STRUCTURES, UnitRole
 from sc2.dicts.unit_train_build_abilities import TRAIN_INFO
 from sc2.dicts.unit_trained_from import UNIT_TRAINED_FROM
 from sc2.dicts.upgrade_researched_from import UPGRADE_RESEARCHED_FROM
@@ -11,42 +12,87 @@ from sc2.position import Point2
 from sc2.unit import Unit
 from sc2.units import Units
 
-from ..action import Action, Build, DoNothing, Research, Train
+from ..action import Action, Build, Research, Train
+from ..placement import PlacementIndex
 from .component import Component
 
+PLACED_STRUCTURES = {
+    UnitTypeId.HATCHERY,
+    UnitTypeId.SPAWNINGPOOL,
+    UnitTypeId.SPIRE,
+}
+
+
+@dataclass
+class MacroPlan:
+    minerals: float
+    vespene: float
+    supply: float
+    planned: Counter[UnitTypeId | UpgradeId] = field(default_factory=Counter)
+    trainers: set[int] = field(default_factory=set)
+
+    def can_afford(self, minerals: float, vespene: float, supply: float = 0.0) -> bool:
+        return minerals <= self.minerals and vespene <= self.vespene and (supply <= 0 or supply <= self.supply)
+
+    def allocate(self, item: UnitTypeId | UpgradeId, trainer: Unit, minerals: float, vespene: float, supply: float):
+        self.minerals -= minerals
+        self.vespene -= vespene
+        self.supply -= supply
+        self.planned[item] += 1
+        self.trainers.add(trainer.tag)
+
 
 class Macro(Component):
+    placement: PlacementIndex
+
     def macro(self, unit: UnitTypeId) -> Iterable[Action]:
-        yield (
-            self.wait_for_build_order_completion()
-            or self.build_unit(unit, limit=1 if unit == UnitTypeId.DRONE else None)
-            or self.build_unit(
-                UnitTypeId.QUEEN, limit=self.townhalls.amount - len(self.mediator.get_own_army_dict[UnitTypeId.QUEEN])
-            )
-            or self.make_tech(unit)
-            or self.research_upgrade(UpgradeId.ZERGLINGMOVEMENTSPEED)
-            or self.build_unit(UnitTypeId.OVERLORD, limit=1 if self.supply_left <= 0 else 0)
-            or self.expand()
-            or DoNothing()
+        if not self.build_order_runner.build_completed:
+            return
+
+        self.release_builders()
+        plan = self.macro_plan()
+        yield from self.build_units(plan, unit, limit=1 if unit == UnitTypeId.DRONE else None)
+        yield from self.build_units(
+            plan,
+            UnitTypeId.QUEEN,
+            limit=self.townhalls.amount - len(self.mediator.get_own_army_dict[UnitTypeId.QUEEN]),
+        )
+        yield from self.make_tech(plan, unit)
+        if action := self.research_upgrade(plan, UpgradeId.ZERGLINGMOVEMENTSPEED):
+            yield action
+        yield from self.build_units(plan, UnitTypeId.OVERLORD, limit=1 if plan.supply <= 0 else 0)
+        if action := self.expand(plan):
+            yield action
+
+    def release_builders(self) -> None:
+        # spots are only checked locally, so a builder that went idle could not place its structure
+        for worker in self.mediator.get_units_from_role(role=UnitRole.PERSISTENT_BUILDER):
+            if worker.is_idle:
+                self.mediator.assign_role(tag=worker.tag, role=UnitRole.GATHERING)
+
+    def macro_plan(self) -> MacroPlan:
+        # workers en route to a building site count as pending, but have not been charged yet
+        reserved_minerals = 0
+        reserved_vespene = 0
+        for structure in PLACED_STRUCTURES:
+            if count := self.worker_en_route_to_build(structure):
+                cost = self.calculate_cost(structure)
+                reserved_minerals += count * cost.minerals
+                reserved_vespene += count * cost.vespene
+        return MacroPlan(
+            minerals=self.minerals - reserved_minerals,
+            vespene=self.vespene - reserved_vespene,
+            supply=self.supply_left,
         )
 
-    @cached_property
-    def tech_building_position(self):
-        return self.start_location.towards(self.game_info.map_center, 8)
-
-    def wait_for_build_order_completion(self) -> Action | None:
-        if self.build_order_runner.build_completed:
-            return None
-        return DoNothing()
-
-    def expand(self) -> Action | None:
+    def expand(self, plan: MacroPlan) -> Action | None:
         if not self.already_pending_upgrade(UpgradeId.ZERGLINGMOVEMENTSPEED):
             return None
         elif not (target := self.get_next_free_expansion()):
             return None
-        return self.build_unit(UnitTypeId.HATCHERY, target=target, limit=1)
+        return self.build_unit(plan, UnitTypeId.HATCHERY, target=target, limit=1)
 
-    def make_tech(self, unit: UnitTypeId) -> Action | None:
+    def make_tech(self, plan: MacroPlan, unit: UnitTypeId) -> Iterable[Action]:
         build_structures: set[UnitTypeId] = set()
         if unit == UnitTypeId.ZERGLING:
             build_structures.add(UnitTypeId.SPAWNINGPOOL)
@@ -57,12 +103,12 @@ class Macro(Component):
 
         for requirement in build_structures:
             if action := self.build_unit(
+                plan,
                 requirement,
                 target=self.tech_building_position,
                 limit=1 - len(self.mediator.get_own_structures_dict[requirement]),
             ):
-                return action
-        return None
+                yield action
 
     def get_next_free_expansion(self) -> Point2 | None:
         taken = {th.position for th in self.townhalls}
@@ -72,9 +118,12 @@ class Macro(Component):
         self,
         type_id: UnitTypeId | UpgradeId,
         target: Point2 | None = None,
+        exclude: set[int] | None = None,
     ) -> Unit | None:
         def filter_trainer(t: Unit) -> bool:
             # TODO: handle reactors
+            if exclude and t.tag in exclude:
+                return False
             if t.type_id in ALL_STRUCTURES and not t.is_idle:
                 return False
             return True
@@ -96,27 +145,41 @@ class Macro(Component):
 
         return max(trainers, key=trainer_priority, default=None)
 
-    def build_unit(self, unit: UnitTypeId, target: Point2 | None = None, limit: int | None = None) -> Action | None:
-        if self.supply_left < self.calculate_supply_cost(unit):
+    def build_units(
+        self, plan: MacroPlan, unit: UnitTypeId, target: Point2 | None = None, limit: int | None = None
+    ) -> Iterable[Action]:
+        # every allocation consumes a trainer, so this terminates
+        while action := self.build_unit(plan, unit, target=target, limit=limit):
+            yield action
+
+    def build_unit(
+        self, plan: MacroPlan, unit: UnitTypeId, target: Point2 | None = None, limit: int | None = None
+    ) -> Action | None:
+        cost = self.calculate_cost(unit)
+        supply = self.calculate_supply_cost(unit)
+        if limit is not None and limit <= self.already_pending(unit) + plan.planned[unit]:
             return None
-        elif limit is not None and limit <= self.already_pending(unit):
-            return None
-        elif not (trainer := self.find_trainer(unit, target=target)):
-            return None
-        elif not self.can_afford(unit):
+        elif not plan.can_afford(cost.minerals, cost.vespene, supply):
             return None
         elif self.tech_requirement_progress(unit) < 1:
             return None
+        elif not (trainer := self.find_trainer(unit, target=target, exclude=plan.trainers)):
+            return None
         elif TRAIN_INFO[trainer.type_id][unit].get("requires_placement_position", False):
-            return Build(trainer, unit, target)
+            if not (position := self.placement.find(unit, target or self.start_location)):
+                return None
+            plan.allocate(unit, trainer, cost.minerals, cost.vespene, supply)
+            return Build(trainer, unit, position)
+        plan.allocate(unit, trainer, cost.minerals, cost.vespene, supply)
         return Train(trainer, unit)
 
-    def research_upgrade(self, upgrade: UpgradeId) -> Action | None:
-        if self.already_pending_upgrade(upgrade):
+    def research_upgrade(self, plan: MacroPlan, upgrade: UpgradeId) -> Action | None:
+        if self.already_pending_upgrade(upgrade) or plan.planned[upgrade]:
             return None
-        elif not (researcher := self.find_trainer(upgrade)):
+        elif not (researcher := self.find_trainer(upgrade, exclude=plan.trainers)):
             return None
-        elif not self.can_afford(upgrade):
-            # return DoNothing()
+        cost = self.calculate_cost(upgrade)
+        if not plan.can_afford(cost.minerals, cost.vespene):
             return None
+        plan.allocate(upgrade, researcher, cost.minerals, cost.vespene, 0)
         return Research(researcher, upgrade)
@@ -1,109 +1,287 @@
 import math
+import random
+import threading
 from dataclasses import dataclass
-from enum import Enum, auto
-from itertools import chain, cycle
-from typing import Iterable
+from enum import IntEnum, auto
+from itertools import chain
+from typing import Callable, Iterable, TypeVar
 
 import numpy as np
 from ares.consts import DEBUG, EngagementResult
-from cython_extensions.dijkstra import cy_dijkstra  # type: ignore
+from cython_extensions.dijkstra import CompactDijkstraOutput, DijkstraSearch, cy_dijkstra_compact  # type: ignore
 from sc2.ids.ability_id import AbilityId
 from sc2.ids.unit_typeid import UnitTypeId
 from sc2.position import Point2
+from sc2.unit import Unit
+from sc2.units import Units
 
 from ..action import Action, AttackMove, HoldPosition, Move, UseAbility
-from ..combat_predictor_sim import CombatPredictor
+from ..assignment import TargetAssignment
+from ..combat_predictor_sim import CombatPrediction
+from ..hierarchical_pathing import HierarchicalPathing
+from ..map_cache import MapLayers
+from ..pathing import CompactField
+from ..pipeline import StepPipeline
+from ..scouting import ScoutingMap
+from ..unit_registry import UnitRegistry
 from .component import Component
 
 Point = tuple[int, int]
-HALF = Point2((0.5, 0.5))
+ATTACK_FIELD = "attack_field"
+RETREAT_FIELD = "retreat_field"
+ATTACK_PATH_LIMIT = 5
+# cells settled per step for the attack field, the previous field is used until the search completes
+ATTACK_FIELD_BUDGET = 4096
+RETREAT_PATH_LIMIT = 3
+# structures are unpathable, so ground units path to a cell at most this far from their center
+STRUCTURE_REACH = 4
+ARMY_TYPES = frozenset({UnitTypeId.ZERGLING, UnitTypeId.ROACH, UnitTypeId.MUTALISK})
+T = TypeVar("T")
 
 
-class CombatAction(Enum):
+class CombatAction(IntEnum):
     Attack = auto()
     Hold = auto()
     Retreat = auto()
 
 
+class Command(IntEnum):
+    Hold = auto()
+    AttackMove = auto()
+    Move = auto()
+
+
+@dataclass(frozen=True)
+class MicroCommands:
+    tags: np.ndarray
+    command: np.ndarray
+    target: np.ndarray
+
+    def changed(self, previous: "MicroCommands | None") -> np.ndarray:
+        """Mask of units whose command differs from the previous one, tags must be sorted."""
+        if previous is None or not previous.tags.size:
+            return np.ones(len(self.tags), dtype=bool)
+        i = np.minimum(np.searchsorted(previous.tags, self.tags), len(previous.tags) - 1)
+        return (
+            (previous.tags[i] != self.tags)
+            | (previous.command[i] != self.command)
+            | np.any(previous.target[i] != self.target, axis=1)
+        )
+
+
+@dataclass(frozen=True)
+class MicroFields:
+    attack: CompactDijkstraOutput
+    retreat: CompactDijkstraOutput | CompactField
+
+
+def attack_costs(
+    field: CompactDijkstraOutput, sources: np.ndarray, positions: np.ndarray, target_positions: np.ndarray
+) -> np.ndarray:
+    """
+    Cost of shape (units, targets) of sending each unit to each target: the path distance to the target
+    nearest by path, plus the straight distance from there. Units without a path use straight distances.
+    """
+    euclidean = np.linalg.norm(positions[:, None, :] - target_positions[None, :, :], axis=-1)
+    if field.distance is None:
+        return euclidean
+    ends, _ = field.get_path_ends(sources)
+    distance = field.distance[sources[:, 0], sources[:, 1]].astype(float)
+    via_path = distance[:, None] + np.linalg.norm(ends[:, None, :] + 0.5 - target_positions[None, :, :], axis=-1)
+    return np.where(np.isfinite(distance)[:, None], via_path, euclidean)
+
+
+def compute_retreat_field(pathing: np.ndarray, retreat_targets: np.ndarray) -> CompactDijkstraOutput:
+    return cy_dijkstra_compact(pathing, retreat_targets, keep_distance=False)
+
+
+class AttackField:
+    """
+    Attack field computed by an anytime search with a fixed budget per call.
+    While a search is in progress, the cells it has settled are merged over the last complete field,
+    so that the field never covers only part of the map. Settled cells only point to settled cells,
+    which keeps every path free of cycles.
+    A search always runs to completion on the inputs it was started with,
+    and a new one is started from the latest inputs when they differ from those of the previous one.
+    """
+
+    def __init__(self, budget: int = ATTACK_FIELD_BUDGET) -> None:
+        self.budget = budget
+        self.search: DijkstraSearch | None = None
+        self.field: CompactDijkstraOutput | None = None
+        # inputs of the latest search
+        self.pathing = np.empty((0, 0))
+        self.targets = np.empty((0, 2), dtype=np.intp)
+        # may be called from the pipeline thread and the main thread at once
+        self._lock = threading.Lock()
+
+    def __call__(self, pathing: np.ndarray, attack_targets: np.ndarray) -> CompactDijkstraOutput:
+        with self._lock:
+            if not (
+                self.search
+                or (np.array_equal(self.targets, attack_targets) and np.array_equal(self.pathing, pathing))
+            ):
+                self.search = DijkstraSearch(pathing, attack_targets)
+                self.pathing = pathing
+                self.targets = attack_targets
+            if self.search:
+                # without a previous field to fall back to, the first search is completed right away
+                budget = self.budget if self.field else self.pathing.size
+                if self.search.advance(budget):
+                    # distances are kept for target assignment
+                    self.field = self.search.output()
+                    self.search = None
+                elif self.field.direction.shape == self.pathing.shape:
+                    return self._merged(self.field, self.search)
+            return self.field
+
+    @staticmethod
+    def _merged(field: CompactDijkstraOutput, search: DijkstraSearch) -> CompactDijkstraOutput:
+        settled = np.asarray(search.settled, dtype=bool)
+        return CompactDijkstraOutput(
+            np.where(settled, search.direction, field.direction),
+            np.where(settled, search.distance, field.distance),
+        )
+
+
+def decide_micro(
+    sources: np.ndarray,
+    score: np.ndarray,
+    danger: np.ndarray,
+    fields: MicroFields,
+    attack_targets: np.ndarray,
+    retreat_targets: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Commands and targets for all units at once.
+    A positive score means the unit should attack, danger whether it stands in enemy range.
+    """
+    n = len(sources)
+    action = np.where(0 < score, CombatAction.Attack, np.where(danger, CombatAction.Retreat, CombatAction.Hold))
+    command = np.full(n, Command.Hold)
+    target = np.zeros((n, 2))
+
+    attack = action == CombatAction.Attack
+    ends, lengths = fields.attack.get_path_ends(sources[attack], ATTACK_PATH_LIMIT)
+    command[attack] = Command.AttackMove
+    target[attack] = np.where((lengths < 2)[:, None], attack_targets[attack], ends + 0.5)
+
+    retreat = action == CombatAction.Retreat
+    ends, lengths = fields.retreat.get_path_ends(sources[retreat], RETREAT_PATH_LIMIT)
+    # keep fighting while close to safety, but run when further out
+    command[retreat] = np.where((2 <= lengths) & (lengths < RETREAT_PATH_LIMIT), Command.AttackMove, Command.Move)
+    target[retreat] = np.where((lengths < 2)[:, None], retreat_targets[retreat], ends + 0.5)
+
+    return command, target
+
+
 class Micro(Component):
-    _action_cache: dict[int, Action] = {}
+    _micro_commands: MicroCommands | None = None
+    pipeline: StepPipeline | None = None
+    map_layers: MapLayers
+    scouting: ScoutingMap
+    hierarchical_pathing: HierarchicalPathing
+    target_assignment: TargetAssignment
+    attack_field: AttackField
+    own_registry: UnitRegistry
 
-    def micro(self, combat: CombatPredictor, pathing: np.ndarray, supply_used: int) -> Iterable[Action]:
+    def micro(
+        self, combat: CombatPrediction, enemy_units: Units, pathing: np.ndarray, supply_used: int
+    ) -> Iterable[Action]:
         return chain(
-            self.micro_army(combat, pathing, supply_used),
+            self.micro_army(combat, enemy_units, pathing, supply_used),
             self.micro_queens(),
         )
 
-    def micro_army(self, combat: CombatPredictor, pathing: np.ndarray, supply_used: int) -> Iterable[Action]:
-        units = sorted(self.units({UnitTypeId.ZERGLING, UnitTypeId.ROACH, UnitTypeId.MUTALISK}), key=lambda u: u.tag)
-        target_units = sorted(combat.enemy_units.not_flying, key=lambda u: u.tag)
+    def micro_army(
+        self, combat: CombatPrediction, enemy_units: Units, pathing: np.ndarray, supply_used: int
+    ) -> Iterable[Action]:
+        army = self.own_registry.indices(ARMY_TYPES)
+        # enemy units come from the registry, so they are in tag order already
+        target_units = [u for u in enemy_units if not u.is_flying]
         civilians = self.workers
 
         if not target_units or not civilians:
-            for unit in units:
-                if unit.is_idle:
-                    yield AttackMove(unit, self.random_scout_target())
+            # scouting orders are not tracked, so the next commands must all be issued
+            self._micro_commands = None
+            idle = [u for u in self.own_registry.units(army) if u.is_idle]
+            ground = [u for u in idle if not u.is_flying]
+            air = [u for u in idle if u.is_flying]
+            for scouts, cost in ((ground, pathing), (air, None)):
+                if scouts:
+                    for unit, target in zip(scouts, self.scout_targets(scouts, cost)):
+                        yield AttackMove(unit, Point2(target))
             return
 
         attack_targets = [u.position for u in target_units]
-        attack_center = Point2(np.median(np.array(attack_targets), axis=0))
-        attack_targets.sort(key=lambda t: t.distance_to(attack_center), reverse=True)
 
         retreat_targets = [w.position for w in civilians]
         retreat_center = Point2(np.median(np.array(retreat_targets), axis=0))
         retreat_targets.sort(key=lambda t: t.distance_to(retreat_center))
 
-        attack_pathing = cy_dijkstra(
-            pathing,
-            np.array(attack_targets, dtype=np.intp),
-        )
-        retreat_pathing = cy_dijkstra(
-            pathing,
-            np.array(retreat_targets, dtype=np.intp),
-        )
+        fields = self.micro_fields(pathing, attack_targets, retreat_targets)
 
         if self.config[DEBUG]:
             self.mediator.get_map_data_object.draw_influence_in_game(pathing)
 
-        for unit, target, retreat_target in zip(units, cycle(attack_targets), cycle(retreat_targets)):
-            p = unit.position.rounded
-            attack_path_limit = 5
-            attack_path = attack_pathing.get_path(p, attack_path_limit)
-            outcome = combat.prediction.outcome_for[unit.tag]
-
-            bias = 0.0
-            bias += 4 * (supply_used / 200)**2
-            if outcome + bias > EngagementResult.TIE:
-                combat_action = CombatAction.Attack
-            elif pathing[p] > 1:
-                combat_action = CombatAction.Retreat
-            else:
-                combat_action = CombatAction.Hold
-
-            if combat_action == CombatAction.Attack:
-                if len(attack_path) < 2:
-                    action = AttackMove(unit, Point2(target))
-                else:
-                    action = AttackMove(unit, Point2(attack_path[-1]).offset(HALF))
-            elif combat_action == CombatAction.Retreat:
-                retreat_path_limit = 3
-                retreat_path = retreat_pathing.get_path(p, retreat_path_limit)
-                if len(retreat_path) < 2:
-                    action = Move(unit, Point2(retreat_target))
-                elif len(retreat_path) < retreat_path_limit:
-                    action = AttackMove(unit, Point2(retreat_path[-1]).offset(HALF))
-                else:
-                    action = Move(unit, Point2(retreat_path[-1]).offset(HALF))
+        tags = self.own_registry.tags[army]
+        positions = self.own_registry.position[army].astype(float)
+        sources = np.floor(positions).astype(np.intp)
+        target_positions = np.array([u.position for u in target_units])
+        assigned = self.target_assignment.assign(
+            tags,
+            np.array([u.tag for u in target_units], dtype=np.uint64),
+            attack_costs(fields.attack, sources, positions, target_positions),
+        )
+        # units created since the last prediction get the global outcome
+        outcome = np.array([combat.outcome_for.get(tag, combat.outcome) for tag in tags.tolist()], dtype=float)
+        bias = 4 * (supply_used / 200) ** 2
+        command, target = decide_micro(
+            sources=sources,
+            score=outcome + bias - EngagementResult.TIE,
+            danger=pathing[sources[:, 0], sources[:, 1]] > 1,
+            fields=fields,
+            attack_targets=target_positions[assigned],
+            retreat_targets=np.resize(np.array(retreat_targets), (len(army), 2)),
+        )
+
+        # only units whose command changed get an action
+        commands = MicroCommands(tags, command, target)
+        changed = commands.changed(self._micro_commands)
+        self._micro_commands = commands
+        for i in np.flatnonzero(changed).tolist():
+            unit = self.own_registry.unit(army[i])
+            if command[i] == Command.AttackMove:
+                yield AttackMove(unit, Point2(target[i]))
+            elif command[i] == Command.Move:
+                yield Move(unit, Point2(target[i]))
             else:
-                action = HoldPosition(unit)
+                yield HoldPosition(unit)
 
-            is_repeated = action == self._action_cache.get(unit.tag, None)
-            if action and not is_repeated:
-                self._action_cache[unit.tag] = action
-                yield action
+    def micro_fields(
+        self, pathing: np.ndarray, attack_targets: list[Point2], retreat_targets: list[Point2]
+    ) -> MicroFields:
+        attack = self.pipelined(ATTACK_FIELD, self.attack_field, pathing, np.array(attack_targets, dtype=np.intp))
+        # workers are almost always at our bases, whose fields are precomputed
+        if not (retreat := self.map_layers.base_fields.towards(th.position.rounded for th in self.townhalls.ready)):
+            retreat = self.pipelined(
+                RETREAT_FIELD, compute_retreat_field, pathing, np.array(retreat_targets, dtype=np.intp)
+            )
+        return MicroFields(attack, retreat)
+
+    def pipelined(self, stage: str, function: Callable[..., T], *args) -> T:
+        if not self.pipeline:
+            return function(*args)
+        # use the result computed in the background from the previous observation, if it is recent enough
+        result = self.pipeline.collect(stage, self.state.game_loop)
+        self.pipeline.submit(stage, self.state.game_loop, function, *args)
+        if result is None:
+            # wait for this observation's job rather than computing the same inputs twice
+            result = self.pipeline.collect(stage, self.state.game_loop)
+        return result
 
     def micro_queens(self) -> Iterable[Action]:
-        queens = sorted(self.mediator.get_own_army_dict[UnitTypeId.QUEEN], key=lambda u: u.tag)
+        queens = self.own_registry.units(self.own_registry.indices({UnitTypeId.QUEEN}))
         hatcheries = sorted(self.townhalls, key=lambda u: u.distance_to(self.start_location))
         for queen, hatchery in zip(queens, hatcheries):
             queen_position = hatchery.position.towards(self.game_info.map_center, queen.radius + hatchery.radius)
@@ -112,18 +290,26 @@ class Micro(Component):
             elif 1 < queen.distance_to(queen_position):
                 yield AttackMove(queen, queen_position)
 
-    def random_scout_target(self, num_attempts=10) -> Point2:
-        def sample() -> Point2:
-            a = self.game_info.playable_area
-            return Point2(np.random.uniform((a.x, a.y), (a.right, a.top)))
-
-        if self.enemy_structures.exists:
-            return self.enemy_structures.random.position
-        for p in self.enemy_start_locations:
-            if not self.is_visible(p):
-                return p
-        for _ in range(num_attempts):
-            target = sample()
-            if self.in_pathing_grid(target) and not self.is_visible(target):
-                return target
-        return sample()
+    def scout_targets(self, units: list[Unit], pathing: np.ndarray | None) -> np.ndarray:
+        if structures := self.reachable(units[0], [s.position for s in self.enemy_structures]):
+            return np.array([random.choice(structures) for _ in units]).reshape(-1, 2)
+        for p in self.reachable(units[0], [p for p in self.enemy_start_locations if not self.is_visible(p)]):
+            return np.resize(np.array(p), (len(units), 2))
+        return self.scouting.targets(
+            np.array([u.tag for u in units], dtype=np.uint64),
+            np.array([u.position for u in units]).reshape(-1, 2),
+            self.state.game_loop,
+            pathing,
+        )
+
+    def reachable(self, unit: Unit, targets: list[Point2]) -> list[Point2]:
+        """Targets the unit can get to, ground units skip those on islands or behind walls."""
+        if unit.is_flying or not targets:
+            return targets
+        pathing = self.hierarchical_pathing
+        if not (source := pathing.nearest_pathable(unit.position.rounded, 1)):
+            return targets
+        cells = [pathing.nearest_pathable(t.rounded, STRUCTURE_REACH) for t in targets]
+        found = [(t, c) for t, c in zip(targets, cells) if c]
+        distances = pathing.distances(source, [c for _, c in found])
+        return [t for (t, _), d in zip(found, distances) if d < math.inf]
@@ -1,14 +1,18 @@
 from dataclasses import dataclass
 
 import numpy as np
-from cython_extensions import cy_unit_pending
+from cython_extensions.general_utils import cy_unit_pending  # type: ignore
 from sc2.ids.buff_id import BuffId
 from sc2.ids.unit_typeid import UnitTypeId
 from sc2.ids.upgrade_id import UpgradeId
 from sc2.position import Point2
+from sc2.unit import Unit
 
 from .component import Component
 
+# game loops after which the cached state is refreshed even without events, e.g. for enemy lift-offs or mined out bases
+STRATEGY_REFRESH = 224
+
 
 @dataclass
 class StrategyDecision:
@@ -17,8 +21,30 @@ class StrategyDecision:
     tech_building_position: Point2
 
 
+@dataclass(frozen=True)
+class StrategyState:
+    """Strategy inputs that only change on game events."""
+
+    game_loop: int
+    ideal_harvesters: int
+    mutalisk_switch: bool
+
+
 class Strategy(Component):
+    _strategy_state: StrategyState | None = None
+    _strategy_decision: StrategyDecision | None = None
+    # both only ever turn True
+    _build_completed = False
+    _speed_started = False
+
     def decide_strategy(self) -> StrategyDecision:
+        state = self._strategy_state
+        if not state or STRATEGY_REFRESH <= self.state.game_loop - state.game_loop:
+            state = self._strategy_state = self.evaluate_strategy_state()
+        self._build_completed = self._build_completed or self.build_order_runner.build_completed
+        self._speed_started = self._speed_started or bool(self.already_pending_upgrade(UpgradeId.ZERGLINGMOVEMENTSPEED))
+
+        # injects are not reported as events
         larva_per_second = sum(
             sum(
                 (
@@ -33,23 +59,53 @@ class Strategy(Component):
         should_drone = (
             self.minerals < 150
             and self.state.score.collection_rate_minerals < 1.2 * max_spending  # aim for a 20% surplus
-            and self.state.score.food_used_economy < sum(h.ideal_harvesters for h in self.townhalls)
+            and self.state.score.food_used_economy < state.ideal_harvesters
             and not cy_unit_pending(self, UnitTypeId.DRONE)
         )
 
-        early_game = not self.build_order_runner.build_completed
-        mine_gas_for_speed = not self.already_pending_upgrade(UpgradeId.ZERGLINGMOVEMENTSPEED)
+        early_game = not self._build_completed
+        mine_gas_for_speed = not self._speed_started
 
-        mutalisk_switch = self.enemy_structures.flying and not self.enemy_structures.not_flying
         build_unit = (
-            UnitTypeId.DRONE if should_drone else (UnitTypeId.MUTALISK if mutalisk_switch else UnitTypeId.ZERGLING)
+            UnitTypeId.DRONE
+            if should_drone
+            else (UnitTypeId.MUTALISK if state.mutalisk_switch else UnitTypeId.ZERGLING)
         )
-        mine_gas = early_game or mine_gas_for_speed or mutalisk_switch
+        mine_gas = early_game or mine_gas_for_speed or state.mutalisk_switch
 
         vespene_target = 3 if mine_gas else 0
-        tech_building_position = self.start_location.towards(self.game_info.map_center, 8)
-        return StrategyDecision(
-            build_unit=build_unit,
-            vespene_target=vespene_target,
-            tech_building_position=tech_building_position,
+        decision = self._strategy_decision
+        if not decision or (decision.build_unit, decision.vespene_target) != (build_unit, vespene_target):
+            decision = self._strategy_decision = StrategyDecision(
+                build_unit=build_unit,
+                vespene_target=vespene_target,
+                tech_building_position=self.tech_building_position,
+            )
+        return decision
+
+    def evaluate_strategy_state(self) -> StrategyState:
+        return StrategyState(
+            game_loop=self.state.game_loop,
+            ideal_harvesters=sum(h.ideal_harvesters for h in self.townhalls),
+            mutalisk_switch=bool(self.enemy_structures.flying and not self.enemy_structures.not_flying),
         )
+
+    def invalidate_strategy(self) -> None:
+        self._strategy_state = None
+
+    async def on_unit_destroyed(self, unit_tag: int) -> None:
+        await super().on_unit_destroyed(unit_tag)
+        self.invalidate_strategy()
+
+    async def on_building_construction_complete(self, unit: Unit) -> None:
+        await super().on_building_construction_complete(unit)
+        self.invalidate_strategy()
+
+    async def on_upgrade_complete(self, upgrade: UpgradeId) -> None:
+        await super().on_upgrade_complete(upgrade)
+        self.invalidate_strategy()
+
+    async def on_enemy_unit_entered_vision(self, unit: Unit) -> None:
+        await super().on_enemy_unit_entered_vision(unit)
+        if unit.is_structure:
+            self.invalidate_strategy()
@@ -1,3 +1,5 @@
+import os
+
 from ares.consts import ALL_STRUCTURES, CHANGELING_TYPES
 from sc2.constants import WORKER_TYPES, abilityid_to_unittypeid
 from sc2.ids.unit_typeid import UnitTypeId
@@ -8,7 +10,35 @@ TAG_MICRO_THROTTLING: str = "micro_throttling"
 TAG_ACTION_FAILED: str = "action_failed"
 ALL_UNITS = ALL_STRUCTURES | set(abilityid_to_unittypeid.values())
 EXCLUDE_FROM_COMBAT = WORKER_TYPES | CHANGELING_TYPES | {UnitTypeId.LARVA, UnitTypeId.EGG}
-PROFILING_FILE = "profiling"
+# units without any effect on a fight, which the combat model ignores
+NON_COMBAT_TYPES = {
+    UnitTypeId.OVERLORD,
+    UnitTypeId.OVERLORDCOCOON,
+    UnitTypeId.OVERLORDTRANSPORT,
+    UnitTypeId.TRANSPORTOVERLORDCOCOON,
+    UnitTypeId.OVERSEER,
+    UnitTypeId.OVERSEERSIEGEMODE,
+    UnitTypeId.OBSERVER,
+    UnitTypeId.OBSERVERSIEGEMODE,
+    UnitTypeId.CREEPTUMOR,
+    UnitTypeId.CREEPTUMORBURROWED,
+    UnitTypeId.CREEPTUMORQUEEN,
+}
+PIPELINED_STEP = "PipelinedStep"
+COMBAT_MODEL_FILE = "combat_model.npz"
+MAP_CACHE = "MapCache"
+ADAPTIVE_GAME_STEP = "AdaptiveGameStep"
+MIN_GAME_STEP = "MinGameStep"
+MAX_GAME_STEP = "MaxGameStep"
+COMBAT_STAGE = "combat"
+SLOW_STEP_PROFILING = "SlowStepProfiling"
+SLOW_STEP_THRESHOLD = "SlowStepThreshold"
+MAX_PROFILE_CAPTURES = "MaxProfileCaptures"
+LINE_PROFILING = "LineProfiling"
+# remembered enemies within this distance of our units are included in combat predictions
+ENEMY_MEMORY_RANGE = 12
+MAP_CACHE_DIRECTORY = os.path.join("data", "map_cache")
+PROFILING_DIRECTORY = os.path.join("data", "profiling")
 
 DPS_OVERRIDE = {
     UnitTypeId.BUNKER: 40,
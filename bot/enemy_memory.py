@@ -0,0 +1,116 @@
+import numpy as np
+from sc2.unit import Unit
+from sc2.units import Units
+
+# game loops after which a remembered unit is forgotten
+MEMORY_EXPIRY = 224
+# game loops over which positions are extrapolated at most
+MAX_EXTRAPOLATION = 44
+# velocities are only estimated from observations at most this many game loops apart
+MAX_VELOCITY_INTERVAL = 8
+
+
+class EnemyMemory:
+    """
+    Enemy units that left vision, kept in fixed size arrays with one slot per unit.
+    Positions are extrapolated from the last observed velocity. Units are forgotten after MEMORY_EXPIRY,
+    when their extrapolated position is visible without them, or when they are destroyed.
+    When all slots are taken, the unit seen longest ago is replaced.
+    Structures are not tracked, as they are kept as snapshots already.
+    """
+
+    def __init__(self, capacity: int = 256) -> None:
+        # slow to import, so this is deferred until the bot is set up
+        from scipy.spatial import cKDTree
+
+        self._tree_type = cKDTree
+        self.capacity = capacity
+        self.active = np.zeros(capacity, dtype=bool)
+        self.last_seen = np.zeros(capacity, dtype=np.int64)
+        self.position = np.zeros((capacity, 2), dtype=np.float32)
+        self.velocity = np.zeros((capacity, 2), dtype=np.float32)
+        self.health = np.zeros(capacity, dtype=np.float32)
+        self.shield = np.zeros(capacity, dtype=np.float32)
+        self.type_id = np.zeros(capacity, dtype=np.int32)
+        # last observed unit for each slot, to be passed to code expecting units
+        self.units: list[Unit | None] = [None] * capacity
+        self.slots = dict[int, int]()
+        self._index: tuple[int, np.ndarray, object] | None = None
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    def update(self, enemy_units: Units, visibility: np.ndarray, game_loop: int) -> None:
+        """Record the enemy units in vision, and forget stale ones. The visibility grid is of shape (x, y)."""
+        self._index = None
+        for unit in enemy_units:
+            if unit.is_structure or unit.is_snapshot:
+                continue
+            position = np.array(unit.position, dtype=np.float32)
+            if (i := self.slots.get(unit.tag)) is not None:
+                interval = game_loop - self.last_seen[i]
+                if 0 < interval <= MAX_VELOCITY_INTERVAL:
+                    self.velocity[i] = (position - self.position[i]) / interval
+                elif interval:
+                    self.velocity[i] = 0
+            else:
+                i = self._allocate(unit.tag)
+                self.velocity[i] = 0
+            self.last_seen[i] = game_loop
+            self.position[i] = position
+            self.health[i] = unit.health
+            self.shield[i] = unit.shield
+            self.type_id[i] = unit.type_id.value
+            self.units[i] = unit
+
+        remembered = self.active & (self.last_seen < game_loop)
+        expired = remembered & (MEMORY_EXPIRY < game_loop - self.last_seen)
+        # units which should be in vision but are not have moved elsewhere
+        cells = np.clip(self.positions(game_loop).astype(np.intp), 0, np.array(visibility.shape) - 1)
+        expired |= remembered & (visibility[cells[:, 0], cells[:, 1]] == 2)
+        for i in np.flatnonzero(expired).tolist():
+            self._free(i)
+
+    def forget(self, tag: int) -> None:
+        if (i := self.slots.get(tag)) is not None:
+            self._index = None
+            self._free(i)
+
+    def positions(self, game_loop: int) -> np.ndarray:
+        """Extrapolated positions of all slots."""
+        elapsed = np.minimum(game_loop - self.last_seen, MAX_EXTRAPOLATION).astype(np.float32)
+        return self.position + self.velocity * elapsed[:, None]
+
+    def near(self, points: np.ndarray, radius: float, game_loop: int) -> tuple[list[Unit], np.ndarray]:
+        """
+        Remembered units out of vision within radius of any of the points of shape (n, 2),
+        with their extrapolated positions.
+        """
+        if not len(points) or not self.slots:
+            return [], np.empty((0, 2), dtype=np.float32)
+        if not self._index or self._index[0] != game_loop:
+            slots = np.flatnonzero(self.active & (self.last_seen < game_loop))
+            positions = self.positions(game_loop)[slots]
+            self._index = game_loop, slots, self._tree_type(positions) if slots.size else None
+        _, slots, tree = self._index
+        if tree is None:
+            return [], np.empty((0, 2), dtype=np.float32)
+        found = np.unique(np.concatenate([np.array(r, dtype=np.intp) for r in tree.query_ball_point(points, radius)]))
+        found_slots = slots[found]
+        return [self.units[i] for i in found_slots.tolist()], tree.data[found].astype(np.float32)
+
+    def _allocate(self, tag: int) -> int:
+        if len(self.slots) < self.capacity:
+            i = int(np.argmin(self.active))
+        else:
+            i = int(np.argmin(self.last_seen))
+            self._free(i)
+        self.active[i] = True
+        self.slots[tag] = i
+        return i
+
+    def _free(self, i: int) -> None:
+        if unit := self.units[i]:
+            self.slots.pop(unit.tag, None)
+        self.active[i] = False
+        self.units[i] = None
@@ -0,0 +1,122 @@
+from dataclasses import dataclass
+from typing import Callable
+
+import numpy as np
+from ares import AresBot
+
+VISIBILITY = "visibility"
+CREEP = "creep"
+PATHING = "pathing"
+
+
+@dataclass(frozen=True)
+class DirtyRect:
+    """Half open bounds of the changed cells."""
+
+    x0: int
+    y0: int
+    x1: int
+    y1: int
+
+
+@dataclass
+class _Source:
+    read: Callable[[], np.ndarray]
+    """Raw row major buffer of shape (height * width * bits / 8,)."""
+    bits: int
+    owned: bool
+    """
+    Whether the buffer is read only observation data, otherwise it is a view into a python-sc2 grid
+    which may be modified in place during the step, so it is copied for diffs.
+    """
+    previous: np.ndarray | None = None
+    dirty: DirtyRect | None = None
+    version: int = 0
+    game_loop: int = -1
+
+
+class ObservationGrids:
+    """
+    Map grids of shape (x, y) shared by all consumers.
+    Visibility and creep are read from the image data of the observation without copying,
+    creep is unpacked from bits on first access in each game loop.
+    Pathing is the copy taken at the comparison, so it always matches the reported changes.
+    Each grid is compared to its raw data at the previous comparison at most once per game loop,
+    giving the bounding rectangle of changed cells and a version which increases with every change.
+    """
+
+    def __init__(self, bot: AresBot) -> None:
+        self.bot = bot
+        size = bot.game_info.map_size
+        self.width, self.height = size.width, size.height
+        self._sources = {
+            VISIBILITY: _Source(lambda: self._image(self.bot.state.observation_raw.map_state.visibility), 8, True),
+            CREEP: _Source(lambda: self._image(self.bot.state.observation_raw.map_state.creep), 1, True),
+            PATHING: _Source(lambda: self.bot.game_info.pathing_grid.data_numpy.ravel(), 8, False),
+        }
+        self._cache = dict[str, np.ndarray]()
+        self._game_loop = -1
+
+    @property
+    def visibility(self) -> np.ndarray:
+        """0 for hidden, 1 for fogged, 2 for visible."""
+        return self._sources[VISIBILITY].read().reshape(self.height, self.width).T
+
+    @property
+    def creep(self) -> np.ndarray:
+        return self._cached(CREEP, lambda: self._unpack(self._sources[CREEP].read()))
+
+    @property
+    def pathing(self) -> np.ndarray:
+        """Must not be modified."""
+        return self._compare(PATHING).previous.reshape(self.height, self.width).T
+
+    @property
+    def ground_cost(self) -> np.ndarray:
+        """Ground grid including enemy influence, as float64 for pathfinding. Must not be modified."""
+        return self._cached("ground_cost", lambda: self.bot.mediator.get_ground_grid.astype(np.float64))
+
+    def dirty(self, name: str) -> DirtyRect | None:
+        """Changed cells since the previous comparison, None if unchanged. Everything is dirty on the first call."""
+        return self._compare(name).dirty
+
+    def version(self, name: str) -> int:
+        return self._compare(name).version
+
+    def _compare(self, name: str) -> _Source:
+        source = self._sources[name]
+        game_loop = self.bot.state.game_loop
+        if source.game_loop == game_loop:
+            return source
+        source.game_loop = game_loop
+        raw = source.read()
+        if source.previous is None:
+            source.dirty = DirtyRect(0, 0, self.width, self.height)
+        elif (changed := np.flatnonzero(source.previous != raw)).size:
+            if source.bits == 1:
+                # each byte holds eight cells, the first in the most significant bit
+                flipped = np.unpackbits(source.previous[changed] ^ raw[changed]).reshape(-1, 8).astype(bool)
+                changed = (8 * changed[:, None] + np.arange(8))[flipped]
+            y, x = np.divmod(changed, self.width)
+            source.dirty = DirtyRect(int(x.min()), int(y.min()), int(x.max()) + 1, int(y.max()) + 1)
+        else:
+            source.dirty = None
+        if source.dirty:
+            source.version += 1
+        source.previous = raw if source.owned else raw.copy()
+        return source
+
+    def _cached(self, name: str, compute: Callable[[], np.ndarray]) -> np.ndarray:
+        if self._game_loop != self.bot.state.game_loop:
+            self._game_loop = self.bot.state.game_loop
+            self._cache.clear()
+        if (grid := self._cache.get(name)) is None:
+            grid = self._cache[name] = compute()
+        return grid
+
+    def _unpack(self, packed: np.ndarray) -> np.ndarray:
+        return np.unpackbits(packed, count=self.width * self.height).reshape(self.height, self.width).T
+
+    @staticmethod
+    def _image(image) -> np.ndarray:
+        return np.frombuffer(image.data, dtype=np.uint8)
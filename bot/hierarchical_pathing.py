@@ -0,0 +1,247 @@
+import heapq
+import math
+from collections import defaultdict
+from itertools import product
+from typing import Sequence
+
+import numpy as np
+from cython_extensions.dijkstra import cy_dijkstra_compact  # type: ignore
+
+Cell = tuple[int, int]
+Cluster = tuple[int, int]
+# runs of border cells longer than this get an entrance at both ends instead of the middle
+MAX_SINGLE_ENTRANCE = 6
+
+
+def octile(a: Cell, b: Cell) -> float:
+    dx = abs(a[0] - b[0])
+    dy = abs(a[1] - b[1])
+    return max(dx, dy) + (math.sqrt(2) - 1) * min(dx, dy)
+
+
+class HierarchicalPathing:
+    """
+    Hierarchical pathfinding (HPA*) over a pathability grid of shape (x, y).
+    The grid is split into square clusters, connected through entrance cells on their borders.
+    Long range queries search the abstract graph of entrances instead of the full grid.
+    Paths are forced through the entrances, so distances are an upper bound and not the shortest path length:
+    on typical maps they are a few percent longer, but up to about a third on open terrain,
+    and several times longer on fragmented grids with many small openings.
+    """
+
+    def __init__(self, pathable: np.ndarray, cluster_size: int = 16) -> None:
+        self.cluster_size = cluster_size
+        self.pathable = pathable.astype(bool)
+        self.cost = np.where(self.pathable, 1.0, np.inf)
+        self.clusters = tuple(math.ceil(n / cluster_size) for n in pathable.shape)
+        self.graph = defaultdict[Cell, dict[Cell, float]](dict)
+        self.cluster_nodes = defaultdict[Cluster, set[Cell]](set)
+        self.border_edges = dict[tuple[Cluster, Cluster], list[tuple[Cell, Cell]]]()
+        all_clusters = set(product(*map(range, self.clusters)))
+        self._refresh(all_clusters)
+
+    def update(self, pathable: np.ndarray) -> set[Cluster]:
+        """Rebuild the clusters whose cells changed, returns those clusters."""
+        changed = np.argwhere(self.pathable != pathable.astype(bool))
+        if not changed.size:
+            return set()
+        dirty = {(int(x), int(y)) for x, y in np.unique(changed // self.cluster_size, axis=0)}
+        self.pathable = pathable.astype(bool)
+        self.cost = np.where(self.pathable, 1.0, np.inf)
+        self._refresh(dirty)
+        return dirty
+
+    def cluster_of(self, cell: Cell) -> Cluster:
+        return cell[0] // self.cluster_size, cell[1] // self.cluster_size
+
+    def distance(self, source: Cell, target: Cell) -> float:
+        """Length of a path via entrances, never below the shortest path length. Infinite if unreachable."""
+        route = self._search(source, target)
+        return route[1] if route else math.inf
+
+    def distances(self, source: Cell, targets: Sequence[Cell]) -> np.ndarray:
+        """
+        Path lengths via entrances from source to many targets, sharing a single search of the abstract graph.
+        Infinite where the target cannot be reached.
+        """
+        result = np.full(len(targets), math.inf)
+        if not self._is_pathable(source):
+            return result
+        cluster = self.cluster_of(source)
+        start_edges = self._local_distances(
+            source, self.cluster_nodes[cluster] | {t for t in targets if self.cluster_of(t) == cluster}
+        )
+        distances = self._abstract_distances(start_edges)
+        for i, target in enumerate(targets):
+            if target == source:
+                result[i] = 0.0
+            elif self._is_pathable(target):
+                goal_edges = self._local_distances(target, self.cluster_nodes[self.cluster_of(target)])
+                result[i] = min(
+                    [start_edges.get(target, math.inf)]
+                    + [distances.get(node, math.inf) + d for node, d in goal_edges.items()]
+                )
+        return result
+
+    def nearest_pathable(self, cell: Cell, radius: int) -> Cell | None:
+        """Closest pathable cell at most radius away along each axis, such as next to a structure."""
+        x, y = cell
+        width, height = self.pathable.shape
+        x0, x1 = max(0, x - radius), min(width, x + radius + 1)
+        y0, y1 = max(0, y - radius), min(height, y + radius + 1)
+        candidates = np.argwhere(self.pathable[x0:x1, y0:y1]) + (x0, y0)
+        if not len(candidates):
+            return None
+        nearest = candidates[np.argmin(np.abs(candidates - cell).sum(axis=1))]
+        return int(nearest[0]), int(nearest[1])
+
+    def route(self, source: Cell, target: Cell) -> list[Cell]:
+        """Waypoints from source to target via cluster entrances, empty if the target cannot be reached."""
+        route = self._search(source, target)
+        return route[0] if route else []
+
+    def _search(self, source: Cell, target: Cell) -> tuple[list[Cell], float] | None:
+        if not (self._is_pathable(source) and self._is_pathable(target)):
+            return None
+        elif source == target:
+            return [source], 0.0
+
+        # temporary edges from the endpoints into the abstract graph
+        start_edges = self._local_distances(source, self.cluster_nodes[self.cluster_of(source)] | {target})
+        goal_edges = self._local_distances(target, self.cluster_nodes[self.cluster_of(target)])
+
+        # A* with the octile distance, which never overestimates
+        distances = {source: 0.0}
+        previous = dict[Cell, Cell]()
+        queue = [(octile(source, target), source)]
+        while queue:
+            _, node = heapq.heappop(queue)
+            if node == target:
+                path = [node]
+                while node in previous:
+                    node = previous[node]
+                    path.append(node)
+                return path[::-1], distances[target]
+            edges = self.graph[node].items() if node in self.graph else []
+            if node == source:
+                edges = [*edges, *start_edges.items()]
+            if node in goal_edges:
+                edges = [*edges, (target, goal_edges[node])]
+            for neighbour, cost in edges:
+                alternative = distances[node] + cost
+                if alternative < distances.get(neighbour, math.inf):
+                    distances[neighbour] = alternative
+                    previous[neighbour] = node
+                    heapq.heappush(queue, (alternative + octile(neighbour, target), neighbour))
+        return None
+
+    def _abstract_distances(self, start_edges: dict[Cell, float]) -> dict[Cell, float]:
+        """Dijkstra over the abstract graph from the given entrances and their initial distances."""
+        distances = dict(start_edges)
+        queue = [(d, node) for node, d in start_edges.items()]
+        heapq.heapify(queue)
+        while queue:
+            d, node = heapq.heappop(queue)
+            if distances[node] < d:
+                continue
+            for neighbour, cost in self.graph.get(node, {}).items():
+                alternative = d + cost
+                if alternative < distances.get(neighbour, math.inf):
+                    distances[neighbour] = alternative
+                    heapq.heappush(queue, (alternative, neighbour))
+        return distances
+
+    def _is_pathable(self, cell: Cell) -> bool:
+        x, y = cell
+        width, height = self.pathable.shape
+        return 0 <= x < width and 0 <= y < height and self.pathable[x, y]
+
+    def _bounds(self, cluster: Cluster) -> tuple[slice, slice]:
+        s = self.cluster_size
+        return slice(cluster[0] * s, (cluster[0] + 1) * s), slice(cluster[1] * s, (cluster[1] + 1) * s)
+
+    def _local_distances(self, source: Cell, cells: set[Cell]) -> dict[Cell, float]:
+        """Distances from source to cells of the same cluster, staying inside the cluster."""
+        cluster = self.cluster_of(source)
+        x_bounds, y_bounds = self._bounds(cluster)
+        cost = self.cost[x_bounds, y_bounds]
+        local_source = np.array([[source[0] - x_bounds.start, source[1] - y_bounds.start]], dtype=np.intp)
+        distance = cy_dijkstra_compact(cost, local_source, checks_enabled=False).distance
+        result = dict[Cell, float]()
+        for cell in cells:
+            if cell != source and self.cluster_of(cell) == cluster:
+                # the search counts the cost of the source cell, which is 1
+                d = float(distance[cell[0] - x_bounds.start, cell[1] - y_bounds.start]) - 1.0
+                if d < math.inf:
+                    result[cell] = d
+        return result
+
+    def _refresh(self, dirty: set[Cluster]) -> None:
+        # entrances on any border of a dirty cluster may have moved
+        borders = set[tuple[Cluster, Cluster]]()
+        for cx, cy in dirty:
+            for neighbour in ((cx - 1, cy), (cx + 1, cy), (cx, cy - 1), (cx, cy + 1)):
+                if 0 <= neighbour[0] < self.clusters[0] and 0 <= neighbour[1] < self.clusters[1]:
+                    borders.add(((cx, cy), neighbour) if (cx, cy) < neighbour else (neighbour, (cx, cy)))
+
+        affected = set(dirty)
+        for border in borders:
+            for u, v in self.border_edges.pop(border, []):
+                self._remove_edge(u, v)
+            self.border_edges[border] = self._find_entrances(*border)
+            affected.update(border)
+
+        for cluster in affected:
+            nodes = self.cluster_nodes[cluster]
+            for node in nodes:
+                for other in [n for n in self.graph[node] if self.cluster_of(n) == cluster]:
+                    del self.graph[node][other]
+            for node in nodes:
+                for other, d in self._local_distances(node, nodes).items():
+                    self.graph[node][other] = d
+
+    def _remove_edge(self, u: Cell, v: Cell) -> None:
+        self.graph[u].pop(v, None)
+        self.graph[v].pop(u, None)
+        # corner cells can be entrances on two borders, keep them while they connect to another cluster
+        for node in (u, v):
+            cluster = self.cluster_of(node)
+            if all(self.cluster_of(n) == cluster for n in self.graph[node]):
+                for neighbour in self.graph.pop(node):
+                    self.graph[neighbour].pop(node, None)
+                self.cluster_nodes[cluster].discard(node)
+
+    def _find_entrances(self, a: Cluster, b: Cluster) -> list[tuple[Cell, Cell]]:
+        s = self.cluster_size
+        if a[0] != b[0]:
+            # vertical border between columns x and x + 1
+            x = b[0] * s - 1
+            ys = np.arange(a[1] * s, min((a[1] + 1) * s, self.pathable.shape[1]))
+            open_cells = self.pathable[x, ys] & self.pathable[x + 1, ys]
+            pairs = [((x, int(y)), (x + 1, int(y))) for y in ys]
+        else:
+            y = b[1] * s - 1
+            xs = np.arange(a[0] * s, min((a[0] + 1) * s, self.pathable.shape[0]))
+            open_cells = self.pathable[xs, y] & self.pathable[xs, y + 1]
+            pairs = [((int(x), y), (int(x), y + 1)) for x in xs]
+
+        edges = list[tuple[Cell, Cell]]()
+        for start, end in self._runs(open_cells):
+            if end - start <= MAX_SINGLE_ENTRANCE:
+                picks = [(start + end - 1) // 2]
+            else:
+                picks = [start, end - 1]
+            for i in picks:
+                u, v = pairs[i]
+                self.cluster_nodes[a].add(u)
+                self.cluster_nodes[b].add(v)
+                self.graph[u][v] = 1.0
+                self.graph[v][u] = 1.0
+                edges.append((u, v))
+        return edges
+
+    @staticmethod
+    def _runs(mask: np.ndarray) -> list[tuple[int, int]]:
+        """Half open index ranges of consecutive True values."""
+        edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+        return list(zip(np.flatnonzero(edges == 1).tolist(), np.flatnonzero(edges == -1).tolist()))
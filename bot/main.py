@@ -1,51 +1,128 @@
-import cProfile
-import io
 import os
-import pstats
 import random
 import sys
-from functools import lru_cache
+import time
 from itertools import chain
 
+import numpy as np
 from ares import DEBUG, AresBot
 from ares.behaviors.macro import Mining
 from loguru import logger
+from sc2.data import Result
 from sc2.ids.unit_typeid import UnitTypeId
+from sc2.unit import Unit
+from sc2.units import Units
 
+from .assignment import TargetAssignment
+from .combat_model import CombatModel
 from .combat_predictor_sim import CombatPredictor, CombatPrediction
 from .components.macro import Macro
-from .components.micro import Micro
+from .components.micro import AttackField, Micro
 from .components.strategy import Strategy
 from .consts import (
-    DPS_OVERRIDE,
+    ADAPTIVE_GAME_STEP,
+    COMBAT_MODEL_FILE,
+    COMBAT_STAGE,
+    ENEMY_MEMORY_RANGE,
     EXCLUDE_FROM_COMBAT,
-    PROFILING_FILE,
+    LINE_PROFILING,
+    MAP_CACHE,
+    MAP_CACHE_DIRECTORY,
+    MAX_GAME_STEP,
+    MAX_PROFILE_CAPTURES,
+    MIN_GAME_STEP,
+    PIPELINED_STEP,
+    PROFILING_DIRECTORY,
+    SLOW_STEP_PROFILING,
+    SLOW_STEP_THRESHOLD,
     TAG_ACTION_FAILED,
     TAG_MICRO_THROTTLING,
     UNKNOWN_VERSION,
     VERSION_FILE,
 )
+from .enemy_memory import EnemyMemory
+from .grids import ObservationGrids
+from .hierarchical_pathing import HierarchicalPathing
+from .map_cache import MapCache, MapLayers, load_map_layers
+from .pipeline import StepPipeline
+from .placement import PlacementIndex
+from .profiling import SlowStepProfiler
+from .scheduler import Event, Stage, StageScheduler
+from .scouting import ScoutingMap
+from .step_controller import StepController
 from .tags import Tags
+from .unit_registry import UnitRegistry
+from .unit_stats import UnitStats
 
 class TwelvePoolBot(Strategy, Micro, Macro, AresBot):
     max_micro_actions = 80
     version: str = UNKNOWN_VERSION
     tags: Tags
+    combat_model: CombatModel | None = None
+    map_layers: MapLayers
+    unit_stats: UnitStats
+    step_controller: StepController | None = None
+    profiler: SlowStepProfiler | None = None
+    scheduler: StageScheduler
+    enemy_memory: EnemyMemory
+    grids: ObservationGrids
+    enemy_registry: UnitRegistry
 
     async def on_start(self) -> None:
         await super().on_start()
 
         self.tags = Tags(lambda m: self.chat_send(m, team_only=True))
+        self.unit_stats = UnitStats(self)
+        # strategy keeps its own event-invalidated cache and macro spends income as soon as it arrives
+        self.scheduler = StageScheduler(
+            [Stage(COMBAT_STAGE, cadence=4, budget=5e-3, triggers={Event.UnitDestroyed, Event.EnemySeen})]
+        )
+
+        map_cache = MapCache.for_bot(self, MAP_CACHE_DIRECTORY) if self.config.get(MAP_CACHE, False) else MapCache(None)
+        self.map_layers = load_map_layers(self, map_cache)
+
+        self.grids = ObservationGrids(self)
+        self.hierarchical_pathing = HierarchicalPathing(self.grids.pathing)
+        self.placement = PlacementIndex(self, self.grids, cache=map_cache)
+        self.scouting = ScoutingMap.for_bot(self)
+        self.enemy_memory = EnemyMemory()
+        self.own_registry = UnitRegistry()
+        self.enemy_registry = UnitRegistry()
+        self.target_assignment = TargetAssignment()
+        self.attack_field = AttackField()
+        self.placement.precompute({UnitTypeId.SPAWNINGPOOL, UnitTypeId.SPIRE}, [self.tech_building_position])
+        self.placement.precompute({UnitTypeId.HATCHERY}, [p for p, _ in self.mediator.get_own_expansions])
+
+        if self.realtime or self.config.get(PIPELINED_STEP, False):
+            # results may be used at most one step late, however many game loops it spans
+            self.pipeline = StepPipeline(max_lag=1)
+
+        if self.config.get(ADAPTIVE_GAME_STEP, False):
+            self.step_controller = StepController(self.config[MIN_GAME_STEP], self.config[MAX_GAME_STEP])
+
+        # falls back to the simulator when no trained model is shipped
+        self.combat_model = CombatModel.load(COMBAT_MODEL_FILE)
 
         if sys.gettrace():
             self.config[DEBUG] = True
 
         if self.config[DEBUG]:
+            import pstats
+
             # increase number of decimal places
             pstats.f8 = lambda x: "%14.9f" % x  # type: ignore
             # await self.client.debug_create_unit([[UnitTypeId.ZERGLING, 40, self.game_info.map_center, 2]])
             # await self.client.debug_create_unit([[UnitTypeId.ZERGLING, 30, self.game_info.map_center, 1]])
 
+        if self.config[DEBUG] or self.config.get(SLOW_STEP_PROFILING, False):
+            hot_functions = [Micro.micro_army, Micro.micro_fields, AttackField.__call__, CombatPredictor._predict]
+            self.profiler = SlowStepProfiler(
+                threshold=self.config.get(SLOW_STEP_THRESHOLD, 0.04),
+                max_captures=self.config.get(MAX_PROFILE_CAPTURES, 5),
+                directory=PROFILING_DIRECTORY,
+                functions=hot_functions if self.config.get(LINE_PROFILING, False) else (),
+            )
+
         if os.path.exists(VERSION_FILE):
             with open(VERSION_FILE) as f:
                 self.version = f.read()
@@ -53,29 +130,34 @@ class TwelvePoolBot(Strategy, Micro, Macro, AresBot):
         await self.tags.add_tag(f"version_{self.version}")
 
     async def on_step(self, iteration: int) -> None:
+        step_start = time.perf_counter()
+        if self.profiler:
+            self.profiler.start()
         await super().on_step(iteration)
 
-        profiler: cProfile.Profile | None = None
-        if self.config[DEBUG] and (iteration % 30) == 10:
-            profiler = cProfile.Profile()
+        self.own_registry.update(self.all_own_units)
+        self.enemy_registry.update(self.all_enemy_units)
 
-        if profiler:
-            profiler.enable()
+        self.scouting.update(self.grids.visibility, self.state.game_loop)
+        # only clusters whose pathability changed are rebuilt
+        self.hierarchical_pathing.update(self.grids.pathing)
+
+        game_loop = self.state.game_loop
         strategy = self.decide_strategy()
 
-        
-        units = self.all_own_units.exclude_type(EXCLUDE_FROM_COMBAT)
-        enemy_units = self.all_enemy_units.exclude_type(EXCLUDE_FROM_COMBAT)
-        predictor = CombatPredictor(self, units, enemy_units)
+        enemy_combatants = self.enemy_registry.indices(EXCLUDE_FROM_COMBAT, exclude=True)
+        enemy_units = Units(self.enemy_registry.units(enemy_combatants), self)
+        self.enemy_memory.update(enemy_units, self.grids.visibility, game_loop)
+        prediction = self.scheduler.run(COMBAT_STAGE, game_loop, self.predict_combat, enemy_units)
 
         if strategy.build_unit not in {UnitTypeId.ZERGLING, UnitTypeId.DRONE}:
             await self.tags.add_tag(f"macro_{strategy.build_unit.name}")
         if self.mediator.get_own_army_dict[UnitTypeId.ROACH]:
             await self.tags.add_tag("macro_ROACH")
 
-        pathing = self.mediator.get_ground_grid.astype(float)
+        pathing = self.grids.ground_cost
         macro_actions = list(self.macro(strategy.build_unit))
-        micro_actions = list(self.micro(predictor, pathing, self.supply_used))
+        micro_actions = list(self.micro(prediction, enemy_units, pathing, self.supply_used))
 
         # avoid APM bug
         if self.max_micro_actions < len(micro_actions):
@@ -84,13 +166,6 @@ class TwelvePoolBot(Strategy, Micro, Macro, AresBot):
             random.shuffle(micro_actions)
             micro_actions = micro_actions[: self.max_micro_actions]
 
-        if profiler:
-            profiler.disable()
-            stats_io = io.StringIO()
-            stats = pstats.Stats(profiler, stream=stats_io).sort_stats(pstats.SortKey.TIME).print_stats(24)
-            logger.info(stats_io.getvalue())
-            stats.dump_stats(PROFILING_FILE)
-
         actions = chain(macro_actions, micro_actions)
         for action in actions:
             success = await action.execute(self)
@@ -103,11 +178,46 @@ class TwelvePoolBot(Strategy, Micro, Macro, AresBot):
 
         self.register_behavior(Mining(workers_per_gas=strategy.vespene_target))
 
-    @lru_cache(maxsize=None)
-    def dps_fast(self, unit: UnitTypeId) -> float:
-        if dps := DPS_OVERRIDE.get(unit):
-            return dps
-        elif units := self.all_units(unit):
-            return max(units[0].ground_dps, units[0].air_dps)
+        step_time = time.perf_counter() - step_start
+        if self.profiler:
+            self.profiler.stop(step_time, game_loop)
+
+        if self.step_controller:
+            step = self.step_controller.update(step_time, prediction.engaged)
+            self.client.game_step = step
+
+    def predict_combat(self, enemy_units: Units) -> CombatPrediction:
+        # own units are only looked up when the prediction runs
+        units = Units(self.own_registry.units(self.own_registry.indices(EXCLUDE_FROM_COMBAT, exclude=True)), self)
+        # enemies that just left vision still count, so that predictions do not flip back and forth
+        positions = np.array([u.position for u in units]).reshape(-1, 2)
+        remembered, remembered_positions = self.enemy_memory.near(positions, ENEMY_MEMORY_RANGE, self.state.game_loop)
+        if remembered:
+            visible_positions = np.array([u.position for u in enemy_units]).reshape(-1, 2)
+            enemy_positions = np.concatenate((visible_positions, remembered_positions))
+            enemy_units = Units(chain(enemy_units, remembered), self)
         else:
-            return 0.0
+            enemy_positions = None
+        return CombatPredictor(
+            self,
+            units,
+            enemy_units,
+            model=self.combat_model,
+            enemy_positions=enemy_positions,
+            stats=self.unit_stats,
+        ).prediction
+
+    async def on_unit_destroyed(self, unit_tag: int) -> None:
+        await super().on_unit_destroyed(unit_tag)
+        self.enemy_memory.forget(unit_tag)
+        self.scheduler.invalidate(Event.UnitDestroyed)
+
+    async def on_enemy_unit_entered_vision(self, unit: Unit) -> None:
+        await super().on_enemy_unit_entered_vision(unit)
+        self.scheduler.invalidate(Event.EnemySeen)
+
+    async def on_end(self, game_result: Result) -> None:
+        await super().on_end(game_result)
+        logger.info(f"Stage scheduler:\n{self.scheduler.report()}")
+        if self.pipeline:
+            self.pipeline.shutdown()
@@ -0,0 +1,106 @@
+import hashlib
+import os
+from dataclasses import dataclass
+from typing import Callable
+
+import numpy as np
+from ares import AresBot
+from cython_extensions.dijkstra import cy_dijkstra_compact  # type: ignore
+from loguru import logger
+
+from .pathing import BaseFields, quantize_distance
+
+# bump when the layout of cached arrays changes
+MAP_CACHE_VERSION = 3
+
+
+class MapCache:
+    """
+    Map derived arrays persisted as .npy files in a directory addressed by the map contents.
+    Without a directory, arrays are only kept in memory for the current game.
+    """
+
+    def __init__(self, directory: str | None) -> None:
+        self.directory = directory
+        self._memory = dict[str, np.ndarray]()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def for_bot(cls, bot: AresBot, root: str) -> "MapCache":
+        digest = hashlib.sha1()
+        digest.update(f"{MAP_CACHE_VERSION}:{bot.game_info.map_name}".encode())
+        # the creep at game start tells apart spawn locations
+        for grid in (bot.game_info.placement_grid, bot.game_info.pathing_grid, bot.state.creep):
+            digest.update(str(grid.data_numpy.shape).encode())
+            digest.update(grid.data_numpy.tobytes())
+        return MapCache(os.path.join(root, digest.hexdigest()))
+
+    def load(self, name: str) -> np.ndarray | None:
+        if not self.directory:
+            return self._memory.get(name)
+        path = self._path(name)
+        if not os.path.exists(path):
+            return None
+        # copy-on-write, so that the arrays can be passed to typed memoryviews
+        return np.load(path, mmap_mode="c")
+
+    def save(self, name: str, array: np.ndarray) -> None:
+        if not self.directory:
+            self._memory[name] = array
+            return
+        path = self._path(name)
+        # several games may run on the same map concurrently, so never expose a partial file
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as f:
+            np.save(f, array)
+        os.replace(temporary, path)
+        logger.info(f"Saved {path}")
+
+    def get(self, name: str, compute: Callable[[], np.ndarray]) -> np.ndarray:
+        if (array := self.load(name)) is None:
+            self.save(name, compute())
+            array = self.load(name)
+        return array
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, f"{name}.npy")
+
+
+@dataclass(frozen=True)
+class MapLayers:
+    base_fields: BaseFields
+    """Shortest paths towards each base on the static pathing grid."""
+
+
+def static_cost(bot: AresBot, bases: np.ndarray) -> np.ndarray:
+    """Cost grid of shape (x, y) with townhall footprints cleared, so that bases are valid targets."""
+    pathable = bot.game_info.pathing_grid.data_numpy.T.copy()
+    for x, y in bases:
+        pathable[x - 2 : x + 3, y - 2 : y + 3] = 1
+    return np.where(pathable == 1, 1.0, np.inf)
+
+
+def base_fields(cost: np.ndarray, bases: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Direction codes and quantized distances, both of shape (bases, x, y)."""
+    fields = [cy_dijkstra_compact(cost, bases[i : i + 1]) for i in range(len(bases))]
+    direction = np.stack([f.direction for f in fields])
+    distance = np.stack([quantize_distance(f.distance) for f in fields])
+    return direction, distance
+
+
+def load_map_layers(bot: AresBot, cache: MapCache) -> MapLayers:
+    bases = cache.get(
+        "bases",
+        lambda: np.array(sorted(p.rounded for p in bot.expansion_locations_list), dtype=np.intp),
+    )
+    cost = static_cost(bot, bases)
+    direction = cache.load("base_direction")
+    distance = cache.load("base_distance")
+    if direction is None or distance is None:
+        direction, distance = base_fields(cost, bases)
+        cache.save("base_direction", direction)
+        cache.save("base_distance", distance)
+        direction = cache.load("base_direction")
+        distance = cache.load("base_distance")
+    return MapLayers(base_fields=BaseFields(bases, direction, distance))
@@ -0,0 +1,120 @@
+from dataclasses import dataclass
+from typing import Iterable
+
+import numpy as np
+from cython_extensions.dijkstra import DijkstraOutput  # type: ignore
+
+# same neighbour order as cy_dijkstra, code k points to the next cell at (x + DIRECTION_X[k], y + DIRECTION_Y[k])
+DIRECTION_X = np.array([-1, 1, 0, 0, -1, 1, -1, 1])
+DIRECTION_Y = np.array([0, 0, -1, 1, -1, -1, 1, 1])
+NO_DIRECTION = 255
+# fixed point distances, one unit is 1/DISTANCE_SCALE of a cell
+DISTANCE_SCALE = 8
+UNREACHABLE = np.iinfo(np.uint16).max
+
+
+def encode_direction(forward_x: np.ndarray, forward_y: np.ndarray) -> np.ndarray:
+    """Direction codes of shape (x, y) from forward pointer grids."""
+    forward_x = np.asarray(forward_x)
+    forward_y = np.asarray(forward_y)
+    x, y = np.indices(forward_x.shape)
+    # (dx, dy) in {-1, 0, 1}^2 maps onto a lookup table of 9 entries, (0, 0) meaning no successor
+    lookup = np.full(9, NO_DIRECTION, dtype=np.uint8)
+    lookup[3 * (DIRECTION_X + 1) + DIRECTION_Y + 1] = np.arange(8)
+    code = np.where(forward_x < 0, 4, 3 * (forward_x - x + 1) + forward_y - y + 1)
+    return lookup[code]
+
+
+def quantize_distance(distance: np.ndarray) -> np.ndarray:
+    scaled = np.minimum(np.rint(np.asarray(distance) * DISTANCE_SCALE), UNREACHABLE - 1)
+    return np.where(np.isfinite(distance), scaled, UNREACHABLE).astype(np.uint16)
+
+
+@dataclass(frozen=True)
+class CompactField:
+    """Shortest path field with 3 bytes per cell, a drop-in for the pathing objects returned by cy_dijkstra."""
+
+    direction: np.ndarray
+    distance: np.ndarray
+
+    @classmethod
+    def from_dijkstra(cls, output: DijkstraOutput) -> "CompactField":
+        return CompactField(
+            direction=encode_direction(output.forward_x, output.forward_y),
+            distance=quantize_distance(output.distance),
+        )
+
+    def get_path(self, source: tuple[int, int], limit: int = 0) -> list[tuple[int, int]]:
+        x, y = source
+        width, height = self.direction.shape
+        if not (0 <= x < width and 0 <= y < height):
+            return []
+        # a path longer than this must contain a cycle, so it should never be hit anyway
+        limit = limit or self.direction.size
+        path = [(x, y)]
+        while len(path) != limit and (k := self.direction[x, y]) != NO_DIRECTION:
+            x += DIRECTION_X[k]
+            y += DIRECTION_Y[k]
+            path.append((int(x), int(y)))
+        return path
+
+    def get_paths(self, sources: np.ndarray, limit: int = 0) -> list[list[tuple[int, int]]]:
+        return [self.get_path((x, y), limit) for x, y in sources.tolist()]
+
+    def get_path_ends(self, sources: np.ndarray, limit: int = 0) -> tuple[np.ndarray, np.ndarray]:
+        """Endpoints and lengths of the paths from many sources, stepping all of them at once."""
+        ends = np.array(sources, dtype=np.intp).reshape(-1, 2)
+        x, y = ends.T
+        width, height = self.direction.shape
+        active = (0 <= x) & (x < width) & (0 <= y) & (y < height)
+        lengths = active.astype(np.intp)
+        for _ in range((limit or self.direction.size) - 1):
+            code = np.full(len(ends), NO_DIRECTION)
+            code[active] = self.direction[x[active], y[active]]
+            active &= code != NO_DIRECTION
+            if not active.any():
+                break
+            x[active] += DIRECTION_X[code[active]]
+            y[active] += DIRECTION_Y[code[active]]
+            lengths[active] += 1
+        return ends, lengths
+
+    def distance_at(self, position: tuple[int, int]) -> float:
+        d = self.distance[position]
+        return np.inf if d == UNREACHABLE else d / DISTANCE_SCALE
+
+
+class BaseFields:
+    """Compact fields towards each base, combined on demand into a field towards the nearest of a subset."""
+
+    def __init__(self, bases: np.ndarray, direction: np.ndarray, distance: np.ndarray) -> None:
+        self.bases = bases
+        self.direction = direction
+        self.distance = distance
+        self.index = {(int(x), int(y)): i for i, (x, y) in enumerate(bases)}
+        self._combined: tuple[frozenset[int], CompactField] | None = None
+
+    def field(self, i: int) -> CompactField:
+        return CompactField(self.direction[i], self.distance[i])
+
+    def towards(self, positions: Iterable[tuple[int, int]]) -> CompactField | None:
+        """Field towards the nearest of the given bases, or None if any of them is not a known base."""
+        indices = set[int]()
+        for p in positions:
+            if (i := self.index.get(p)) is None:
+                return None
+            indices.add(i)
+        if not indices:
+            return None
+        key = frozenset(indices)
+        if self._combined and self._combined[0] == key:
+            return self._combined[1]
+        selected = sorted(key)
+        # elementwise min over the selected bases, keeping the direction of the closest one
+        closest = np.argmin(self.distance[selected], axis=0)
+        combined = CompactField(
+            direction=np.take_along_axis(self.direction[selected], closest[None], axis=0)[0],
+            distance=np.take_along_axis(self.distance[selected], closest[None], axis=0)[0],
+        )
+        self._combined = key, combined
+        return combined
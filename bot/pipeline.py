@@ -0,0 +1,57 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Generic, TypeVar
+
+T = TypeVar("T")
+
+
+@dataclass(frozen=True)
+class Stamped(Generic[T]):
+    step: int
+    value: T
+
+
+class StepPipeline:
+    """
+    Runs pure computation stages for the current observation in a background thread,
+    so that they overlap with the round trip fetching the next observation.
+    Results are stamped with the step of their inputs and discarded when older than max_lag steps,
+    which does not depend on the number of game loops per step.
+    """
+
+    def __init__(self, max_lag: int = 1) -> None:
+        self.max_lag = max_lag
+        self.step = 0
+        self._game_loop = -1
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pipeline")
+        self._jobs = dict[str, Future[Stamped]]()
+
+    def submit(self, stage: str, game_loop: int, function: Callable[..., Any], *args: Any) -> bool:
+        """Schedule a stage on this frame's inputs. Arguments must not be mutated afterwards."""
+        step = self._advance(game_loop)
+        if (job := self._jobs.get(stage)) and not job.done():
+            return False
+        self._jobs[stage] = self._executor.submit(lambda: Stamped(step, function(*args)))
+        return True
+
+    def collect(self, stage: str, game_loop: int) -> Any | None:
+        """
+        Result of the last submission if it is recent enough, None otherwise.
+        A pending submission is waited for, as it is further along than computing the stage again.
+        """
+        step = self._advance(game_loop)
+        if not (job := self._jobs.get(stage)):
+            return None
+        result = job.result()
+        if self.max_lag < step - result.step:
+            return None
+        return result.value
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _advance(self, game_loop: int) -> int:
+        if self._game_loop != game_loop:
+            self._game_loop = game_loop
+            self.step += 1
+        return self.step
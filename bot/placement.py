@@ -0,0 +1,222 @@
+from dataclasses import dataclass, field
+from typing import Iterable
+
+import numpy as np
+from ares import AresBot
+from cython_extensions.placement_solver import (  # type: ignore
+    cy_blocked_integral,
+    cy_find_footprints,
+)
+from sc2.ids.unit_typeid import UnitTypeId
+from sc2.position import Point2
+
+from .grids import CREEP, PATHING, DirtyRect, ObservationGrids
+from .map_cache import MapCache
+
+# structures that do not need creep underneath and have their own clearance to resources
+TOWNHALLS = {UnitTypeId.HATCHERY}
+# townhall centers must be further than this from mineral fields and geysers, as for expansion locations
+MINERAL_CLEARANCE = 6
+GEYSER_CLEARANCE = 7
+# largest footprint size, changes this far outside a region can still affect its spots
+MAX_FOOTPRINT = 5
+
+
+@dataclass
+class PlacementRegion:
+    anchor: Point2
+    x_bounds: tuple[int, int]
+    y_bounds: tuple[int, int]
+    stale: bool = True
+    type_ids: set[UnitTypeId] = field(default_factory=set)
+    candidates: dict[UnitTypeId, list[Point2]] = field(default_factory=dict)
+
+
+class PlacementIndex:
+    """Precomputed building spots around fixed anchors, verified locally before use."""
+
+    def __init__(
+        self, bot: AresBot, grids: ObservationGrids, search_radius: int = 8, cache: MapCache | None = None
+    ) -> None:
+        self.bot = bot
+        self.grids = grids
+        self.search_radius = search_radius
+        self.cache = cache
+        self._start_loop = bot.state.game_loop
+        self.regions = dict[Point2, PlacementRegion]()
+        self.avoid = self._resource_grid()
+        self.townhall_avoid = self._townhall_resource_grid()
+        self._versions = {name: grids.version(name) for name in (CREEP, PATHING)}
+        self._tables = dict[bool, np.ndarray]()
+
+    def precompute(self, type_ids: Iterable[UnitTypeId], anchors: Iterable[Point2]) -> None:
+        for anchor in anchors:
+            region = self._region(anchor)
+            region.type_ids.update(type_ids)
+            if not self._restore(region):
+                self._search(region)
+                self._store(region)
+
+    def find(self, type_id: UnitTypeId, near: Point2) -> Point2 | None:
+        """Pop the closest valid spot for type_id near an anchor, or None if there is none."""
+        candidates = self._candidates(type_id, near)
+        size = self.footprint(type_id)
+        while candidates:
+            position = candidates.pop(0)
+            if self.can_place(type_id, position):
+                # the spot stays free on the grids until construction starts, so drop overlapping candidates
+                candidates[:] = [
+                    p for p in candidates if size <= abs(p.x - position.x) or size <= abs(p.y - position.y)
+                ]
+                return position
+        return None
+
+    def can_place(self, type_id: UnitTypeId, position: Point2) -> bool:
+        size = self.footprint(type_id)
+        x0 = int(position.x - size / 2)
+        y0 = int(position.y - size / 2)
+        height, width = self.avoid.shape
+        if x0 < 0 or y0 < 0 or width < x0 + size or height < y0 + size:
+            return False
+        x1 = x0 + size
+        y1 = y0 + size
+        townhall = type_id in TOWNHALLS
+        if townhall and self.townhall_avoid[int(position.y), int(position.x)]:
+            return False
+        table = self._table(townhall)
+        return table[y1, x1] - table[y0, x1] - table[y1, x0] + table[y0, x0] == 0
+
+    def footprint(self, type_id: UnitTypeId) -> int:
+        return int(2 * self.bot.game_data.units[type_id.value].footprint_radius)
+
+    def _candidates(self, type_id: UnitTypeId, near: Point2) -> list[Point2]:
+        region = self._region(near)
+        if type_id not in region.type_ids:
+            region.type_ids.add(type_id)
+            region.stale = True
+        self._refresh()
+        if region.stale:
+            self._search(region)
+        return region.candidates[type_id]
+
+    def _region(self, anchor: Point2) -> PlacementRegion:
+        key = anchor.rounded
+        if not (region := self.regions.get(key)):
+            height, width = self.avoid.shape
+            r = self.search_radius
+            region = self.regions[key] = PlacementRegion(
+                anchor=anchor,
+                x_bounds=(max(0, key.x - r), min(width - 1, key.x + r)),
+                y_bounds=(max(0, key.y - r), min(height - 1, key.y + r)),
+            )
+        return region
+
+    def _search(self, region: PlacementRegion) -> None:
+        region.stale = False
+        region.candidates.clear()
+        for townhall in (False, True):
+            type_ids = [t for t in region.type_ids if (t in TOWNHALLS) == townhall]
+            if not type_ids:
+                continue
+            sizes = [self.footprint(t) for t in type_ids]
+            # all footprints of the same kind are found in a single pass
+            origins = cy_find_footprints(
+                self._table(townhall),
+                [(s, s) for s in sizes],
+                region.x_bounds,
+                region.y_bounds,
+            )
+            for type_id, size, spots in zip(type_ids, sizes, origins):
+                centers = spots + size / 2
+                if townhall:
+                    cells = centers.astype(np.intp)
+                    centers = centers[self.townhall_avoid[cells[:, 1], cells[:, 0]] == 0]
+                order = np.argsort(np.linalg.norm(centers - np.array(region.anchor), axis=1))
+                candidates = [Point2(p) for p in centers[order].tolist()]
+                # the anchor itself (e.g. an expansion location) snapped to the footprint is tried first
+                snapped = Point2(
+                    (int(region.anchor.x - size / 2) + size / 2, int(region.anchor.y - size / 2) + size / 2)
+                )
+                if self.can_place(type_id, snapped):
+                    candidates.insert(0, snapped)
+                region.candidates[type_id] = candidates
+
+    def _cache_name(self, region: PlacementRegion, type_id: UnitTypeId) -> str:
+        x, y = region.anchor.rounded
+        return f"placement_{type_id.name}_{x}_{y}_{self.search_radius}"
+
+    def _restore(self, region: PlacementRegion) -> bool:
+        # only valid for the grids at game start, which are part of the cache key
+        if not self.cache or self.bot.state.game_loop != self._start_loop:
+            return False
+        candidates = dict[UnitTypeId, list[Point2]]()
+        for type_id in region.type_ids:
+            if (spots := self.cache.load(self._cache_name(region, type_id))) is None:
+                return False
+            candidates[type_id] = [Point2(p) for p in spots.tolist()]
+        region.candidates = candidates
+        region.stale = False
+        return True
+
+    def _store(self, region: PlacementRegion) -> None:
+        if not self.cache or self.bot.state.game_loop != self._start_loop:
+            return
+        for type_id, candidates in region.candidates.items():
+            self.cache.save(self._cache_name(region, type_id), np.array(candidates, dtype=float).reshape(-1, 2))
+
+    def _refresh(self) -> None:
+        """Drop the tables when the grids changed, and mark the regions near the changed cells for a new search."""
+        for name in (CREEP, PATHING):
+            if (version := self.grids.version(name)) == self._versions[name]:
+                continue
+            # the latest changes only cover everything since the last refresh if no other change was missed
+            dirty = self.grids.dirty(name) if version == self._versions[name] + 1 else None
+            self._versions[name] = version
+            self._tables.clear()
+            for region in self.regions.values():
+                region.stale = region.stale or not dirty or self._overlaps(region, dirty)
+
+    @staticmethod
+    def _overlaps(region: PlacementRegion, dirty: DirtyRect) -> bool:
+        return (
+            dirty.x0 <= region.x_bounds[1] + MAX_FOOTPRINT
+            and region.x_bounds[0] - MAX_FOOTPRINT < dirty.x1
+            and dirty.y0 <= region.y_bounds[1] + MAX_FOOTPRINT
+            and region.y_bounds[0] - MAX_FOOTPRINT < dirty.y1
+        )
+
+    def _table(self, townhall: bool) -> np.ndarray:
+        self._refresh()
+        if (table := self._tables.get(townhall)) is None:
+            # the solver takes grids of shape (y, x)
+            creep = self.grids.creep.T
+            table = self._tables[townhall] = cy_blocked_integral(
+                np.zeros_like(creep) if townhall else creep,
+                self.bot.game_info.placement_grid.data_numpy,
+                self.grids.pathing.T,
+                np.zeros_like(self.avoid) if townhall else self.avoid,
+                avoid_creep=townhall,
+            )
+        return table
+
+    def _townhall_resource_grid(self) -> np.ndarray:
+        """Cells of shape (y, x) which may not hold the center of a townhall."""
+        avoid = np.zeros_like(self.bot.game_info.placement_grid.data_numpy)
+        height, width = avoid.shape
+        for resource in self.bot.resources:
+            clearance = MINERAL_CLEARANCE if resource.is_mineral_field else GEYSER_CLEARANCE
+            x, y = resource.position
+            x0, x1 = max(0, int(x - clearance)), min(width, int(x + clearance) + 1)
+            y0, y1 = max(0, int(y - clearance)), min(height, int(y + clearance) + 1)
+            cx = np.arange(x0, x1) + 0.5 - x
+            cy = np.arange(y0, y1) + 0.5 - y
+            avoid[y0:y1, x0:x1] |= (cy[:, None] ** 2 + cx[None, :] ** 2 <= clearance**2).astype(avoid.dtype)
+        return avoid
+
+    def _resource_grid(self, margin: int = 3) -> np.ndarray:
+        avoid = np.zeros_like(self.bot.game_info.placement_grid.data_numpy)
+        height, width = avoid.shape
+        for resource in self.bot.resources:
+            x, y = resource.position.rounded
+            avoid[max(0, y - margin) : min(height, y + margin + 1), max(0, x - margin) : min(width, x + margin + 1)] = 1
+        return avoid
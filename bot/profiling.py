@@ -0,0 +1,91 @@
+import os
+from typing import Any, Callable, Iterable
+
+from loguru import logger
+
+
+class SlowStepProfiler:
+    """
+    Keeps the profile of steps taking longer than `threshold` seconds.
+    Steps are only profiled while the recent step time is above `arm_ratio` of the threshold,
+    so that light phases of the game run without profiling overhead.
+    Captures are cProfile stats viewable in snakeviz, or line profiler stats when functions are given.
+    Only the main thread is profiled.
+    """
+
+    def __init__(
+        self,
+        threshold: float,
+        max_captures: int,
+        directory: str,
+        functions: Iterable[Callable[..., Any]] = (),
+        arm_ratio: float = 0.5,
+        smoothing: float = 0.1,
+    ) -> None:
+        self.threshold = threshold
+        self.max_captures = max_captures
+        self.directory = directory
+        self.functions = list(functions)
+        self.arm_ratio = arm_ratio
+        self.smoothing = smoothing
+        self.step_time = 0.0
+        self.captures = 0
+        self._profiler: Any = None
+        if self.functions:
+            try:
+                import line_profiler  # noqa: F401
+            except ImportError:
+                logger.warning("line_profiler is not installed, using cProfile instead")
+                self.functions.clear()
+
+    def start(self) -> None:
+        if self.max_captures <= self.captures or self.step_time < self.arm_ratio * self.threshold:
+            return
+        if self.functions:
+            from line_profiler import LineProfiler
+
+            self._profiler = LineProfiler(*self.functions)
+        else:
+            import cProfile
+
+            self._profiler = cProfile.Profile()
+        self._profiler.enable()
+
+    def stop(self, step_time: float, game_loop: int) -> str | None:
+        """Record the time of the step, returns the path of the capture if one was saved."""
+        # arm immediately on spikes, but disarm slowly
+        if self.step_time < step_time:
+            self.step_time = step_time
+        else:
+            self.step_time += self.smoothing * (step_time - self.step_time)
+        if not (profiler := self._profiler):
+            return None
+        profiler.disable()
+        self._profiler = None
+        if step_time <= self.threshold:
+            return None
+        self.captures += 1
+        os.makedirs(self.directory, exist_ok=True)
+        return self._save_lines(profiler, game_loop) if self.functions else self._save_stats(profiler, game_loop)
+
+    def _save_stats(self, profiler: Any, game_loop: int) -> str:
+        import io
+        import pstats
+
+        path = os.path.join(self.directory, f"step_{game_loop}.prof")
+        stats_io = io.StringIO()
+        stats = pstats.Stats(profiler, stream=stats_io).sort_stats(pstats.SortKey.TIME).print_stats(24)
+        logger.info(f"Slow step at game loop {game_loop}, saved to {path}:\n{stats_io.getvalue()}")
+        stats.dump_stats(path)
+        return path
+
+    def _save_lines(self, profiler: Any, game_loop: int) -> str:
+        import io
+
+        # view with python -m line_profiler
+        path = os.path.join(self.directory, f"step_{game_loop}.lprof")
+        stats_io = io.StringIO()
+        profiler.print_stats(stream=stats_io, stripzeros=True)
+        logger.info(f"Slow step at game loop {game_loop}, saved to {path}:\n{stats_io.getvalue()}")
+        profiler.dump_stats(path)
+        return path
@@ -0,0 +1,60 @@
+import time
+from dataclasses import dataclass, field
+from enum import Enum, auto
+from typing import Any, Callable, Iterable
+
+
+class Event(Enum):
+    UnitDestroyed = auto()
+    EnemySeen = auto()
+
+
+@dataclass
+class Stage:
+    name: str
+    cadence: int
+    """Game loops between runs."""
+    budget: float
+    """Expected run time in seconds, runs exceeding it are counted."""
+    triggers: set[Event] = field(default_factory=set)
+    """Events that make the stage due immediately."""
+    last_run: int | None = None
+    invalidated: bool = False
+    result: Any = None
+    ran: int = 0
+    skipped: int = 0
+    over_budget: int = 0
+
+    def is_due(self, game_loop: int) -> bool:
+        return self.invalidated or self.last_run is None or self.cadence <= game_loop - self.last_run
+
+
+class StageScheduler:
+    """Runs on_step stages at their own cadence, and early when one of their triggers fires."""
+
+    def __init__(self, stages: Iterable[Stage]) -> None:
+        self.stages = {stage.name: stage for stage in stages}
+
+    def invalidate(self, event: Event) -> None:
+        for stage in self.stages.values():
+            if event in stage.triggers:
+                stage.invalidated = True
+
+    def run(self, name: str, game_loop: int, function: Callable[..., Any], *args: Any) -> Any:
+        stage = self.stages[name]
+        if not stage.is_due(game_loop):
+            stage.skipped += 1
+            return stage.result
+        start = time.perf_counter()
+        stage.result = function(*args)
+        if stage.budget < time.perf_counter() - start:
+            stage.over_budget += 1
+        stage.last_run = game_loop
+        stage.invalidated = False
+        stage.ran += 1
+        return stage.result
+
+    def report(self) -> str:
+        return "\n".join(
+            f"{s.name}: ran {s.ran}, skipped {s.skipped}, over budget {s.over_budget}" for s in self.stages.values()
+        )
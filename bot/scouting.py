@@ -0,0 +1,80 @@
+import numpy as np
+from ares import AresBot
+from cython_extensions.dijkstra import cy_dijkstra_compact  # type: ignore
+
+from .assignment import TargetAssignment
+
+# value of the visibility grid for cells currently in vision
+VISIBLE = 2
+# targets are picked one per square block of this size, so that scouts spread out
+SCOUT_BLOCK_SIZE = 8
+# path distance at which the staleness of a cell counts half
+SCOUT_DISTANCE_SCALE = 32.0
+
+
+class ScoutingMap:
+    """
+    Game loop at which each cell of shape (x, y) was last in vision.
+    Scout targets are the stalest cells weighted by path distance, in blocks apart from each other,
+    matched to the scouts at minimum total distance.
+    """
+
+    def __init__(
+        self, playable: np.ndarray, block_size: int = SCOUT_BLOCK_SIZE, distance_scale: float = SCOUT_DISTANCE_SCALE
+    ) -> None:
+        self.playable = playable.astype(bool)
+        self.air_cost = np.where(self.playable, 1.0, np.inf)
+        self.block_size = block_size
+        self.distance_scale = distance_scale
+        self.last_seen = np.zeros(playable.shape, dtype=np.int32)
+        # ground and air scouts are matched separately
+        self._assignments = {False: TargetAssignment(), True: TargetAssignment()}
+
+    @classmethod
+    def for_bot(cls, bot: AresBot) -> "ScoutingMap":
+        area = bot.game_info.playable_area
+        playable = np.zeros(bot.game_info.pathing_grid.data_numpy.T.shape, dtype=bool)
+        playable[area.x : area.right, area.y : area.top] = True
+        return ScoutingMap(playable)
+
+    def update(self, visibility: np.ndarray, game_loop: int) -> None:
+        np.copyto(self.last_seen, game_loop, where=visibility == VISIBLE)
+
+    def targets(self, tags: np.ndarray, positions: np.ndarray, game_loop: int, cost: np.ndarray | None) -> np.ndarray:
+        """
+        Target for each scout, given their positions of shape (n, 2) and the ground cost grid, or None for air units.
+        Distances are measured to the nearest scout. Scouts stay in place when nothing is reachable.
+        """
+        flying = cost is None
+        if not len(positions):
+            return positions
+        sources = np.floor(positions).astype(np.intp)
+        distance = cy_dijkstra_compact(self.air_cost if flying else cost, sources).distance
+        reachable = self.playable & np.isfinite(distance)
+        staleness = (game_loop - self.last_seen).astype(np.float32)
+        score = np.where(reachable, staleness / (1 + distance / self.distance_scale), -1.0)
+
+        # best cell of each block
+        b = self.block_size
+        nx, ny = score.shape[0] // b, score.shape[1] // b
+        blocks = score[: nx * b, : ny * b].reshape(nx, b, ny, b).transpose(0, 2, 1, 3).reshape(nx * ny, b * b)
+        best_cell = blocks.argmax(axis=1)
+        block_score = blocks[np.arange(nx * ny), best_cell]
+
+        # greedily take the best block, and suppress its neighbours so that targets are a block apart
+        bx, by = np.divmod(np.arange(nx * ny), ny)
+        chosen = list[int]()
+        for _ in range(len(positions)):
+            i = int(block_score.argmax())
+            if block_score[i] < 0:
+                break
+            chosen.append(i)
+            block_score[(abs(bx - bx[i]) <= 1) & (abs(by - by[i]) <= 1)] = -1
+        if not chosen:
+            return positions
+        cx, cy = np.divmod(best_cell[chosen], b)
+        targets = np.stack((bx[chosen] * b + cx, by[chosen] * b + cy), axis=1) + 0.5
+
+        cost_matrix = np.linalg.norm(positions[:, None, :] - targets[None, :, :], axis=-1)
+        assigned = self._assignments[flying].assign(tags, np.array(chosen), cost_matrix)
+        return targets[assigned]
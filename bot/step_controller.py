@@ -0,0 +1,29 @@
+import math
+
+# game loops per second at faster game speed
+LOOPS_PER_SECOND = 22.4
+
+
+class StepController:
+    """
+    Chooses the number of game loops per step from the measured time per step.
+    The step is as short as the real-time deadline allows during engagements and relaxed to max_step otherwise.
+    """
+
+    def __init__(self, min_step: int, max_step: int, headroom: float = 1.5, smoothing: float = 0.1) -> None:
+        self.min_step = min_step
+        self.max_step = max_step
+        self.headroom = headroom
+        self.smoothing = smoothing
+        self.step_time = 0.0
+
+    def update(self, step_time: float, engaged: bool) -> int:
+        # react to spikes immediately, but recover slowly
+        if self.step_time < step_time:
+            self.step_time = step_time
+        else:
+            self.step_time += self.smoothing * (step_time - self.step_time)
+        # a step must be computed faster than the game advances in real-time
+        required = math.ceil(self.headroom * self.step_time * LOOPS_PER_SECOND)
+        step = required if engaged else self.max_step
+        return min(max(step, self.min_step), self.max_step)
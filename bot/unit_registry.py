@@ -0,0 +1,68 @@
+from collections.abc import Sequence, Set
+
+import numpy as np
+from sc2.ids.unit_typeid import UnitTypeId
+from sc2.unit import Unit
+from sc2.units import Units
+
+
+class UnitRegistry:
+    """
+    Units sorted by tag, with their types and positions in arrays that are updated in place.
+    Index arrays of type filtered views are kept until a unit is added, removed or changes type,
+    so that the ordering and filtering is not repeated every step.
+    Consumers work on indices, and only look up the unit objects they act on,
+    as python-sc2 creates new ones every step.
+    """
+
+    def __init__(self) -> None:
+        self.tags = np.empty(0, dtype=np.uint64)
+        self.type_id = np.empty(0, dtype=np.int32)
+        self.position = np.empty((0, 2), dtype=np.float32)
+        self.order = np.empty(0, dtype=np.intp)
+        """Index of each unit in this step's units."""
+        self._units: Sequence[Unit] = ()
+        self._views = dict[tuple[frozenset[UnitTypeId], bool], np.ndarray]()
+
+    def __len__(self) -> int:
+        return len(self.tags)
+
+    def update(self, units: Units) -> bool:
+        """Update from this step's units, returns whether the views changed."""
+        n = len(units)
+        tags = np.fromiter((u.tag for u in units), dtype=np.uint64, count=n)
+        type_id = np.fromiter((u.type_id.value for u in units), dtype=np.int32, count=n)
+        position = np.array([u.position_tuple for u in units], dtype=np.float32).reshape(-1, 2)
+
+        # slots of the units in the current order, valid when the set of tags is the same
+        slots = np.searchsorted(self.tags, tags)
+        same_tags = n == len(self.tags) and (not n or bool(np.all(self.tags[np.minimum(slots, n - 1)] == tags)))
+        if not same_tags:
+            slots = np.empty(n, dtype=np.intp)
+            slots[np.argsort(tags)] = np.arange(n)
+            self.tags = np.sort(tags)
+            self.type_id = np.empty(n, dtype=np.int32)
+            self.position = np.empty((n, 2), dtype=np.float32)
+        changed = not same_tags or not np.array_equal(self.type_id[slots], type_id)
+        self.type_id[slots] = type_id
+        self.position[slots] = position
+        self.order = np.empty(n, dtype=np.intp)
+        self.order[slots] = np.arange(n)
+        self._units = units
+        if changed:
+            self._views.clear()
+        return changed
+
+    def indices(self, type_ids: Set[UnitTypeId], exclude: bool = False) -> np.ndarray:
+        """Indices of the units of the given types in tag order, or of all other units."""
+        key = frozenset(type_ids), exclude
+        if (view := self._views.get(key)) is None:
+            values = np.array([t.value for t in key[0]], dtype=np.int32)
+            view = self._views[key] = np.flatnonzero(np.isin(self.type_id, values, invert=exclude))
+        return view
+
+    def unit(self, index: int) -> Unit:
+        return self._units[self.order[index]]
+
+    def units(self, indices: np.ndarray) -> list[Unit]:
+        return [self._units[i] for i in self.order[indices].tolist()]
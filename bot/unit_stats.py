@@ -0,0 +1,99 @@
+import numpy as np
+from ares import AresBot
+from cython_extensions.unit_data import UNIT_DATA  # type: ignore
+from sc2.constants import TARGET_AIR, TARGET_GROUND
+from sc2.ids.unit_typeid import UnitTypeId
+from sc2.units import Units
+
+from .consts import DPS_OVERRIDE
+
+# columns of the stat table, one row per UnitTypeId value
+UNIT_STAT_COLUMNS = (
+    "ground_dps",
+    "air_dps",
+    "ground_range",
+    "air_range",
+    "armor",
+    "radius",
+)
+GROUND_DPS, AIR_DPS, GROUND_RANGE, AIR_RANGE, ARMOR, RADIUS = range(len(UNIT_STAT_COLUMNS))
+# range overrides matching python-sc2
+RANGE_OVERRIDE = {
+    UnitTypeId.ORACLE: 4,
+    UnitTypeId.BATTLECRUISER: 6,
+}
+
+
+class UnitStats:
+    """
+    Static per type stats in a NumPy table indexed by UnitTypeId value, so that stats for many units
+    are a single fancy index. Weapons and armor come from the game data.
+    The game data has no health, so the current health and shields of the units are used instead.
+    """
+
+    def __init__(self, bot: AresBot) -> None:
+        size = max(t.value for t in UnitTypeId) + 1
+        self.table = np.zeros((size, len(UNIT_STAT_COLUMNS)), dtype=np.float32)
+        # attacks per second against ground and air, for applying damage upgrades and armor
+        self.hit_rate = np.zeros((size, 2), dtype=np.float32)
+        for type_value, data in bot.game_data.units.items():
+            if type_value >= size:
+                continue
+            proto = data._proto
+            row = self.table[type_value]
+            for column, targets in enumerate((TARGET_GROUND, TARGET_AIR)):
+                if weapon := next((w for w in proto.weapons if w.type in targets), None):
+                    row[GROUND_DPS + column] = weapon.damage * weapon.attacks / weapon.speed
+                    row[GROUND_RANGE + column] = weapon.range
+                    self.hit_rate[type_value, column] = weapon.attacks / weapon.speed
+            row[ARMOR] = proto.armor
+        for type_id, data in UNIT_DATA.items():
+            self.table[type_id.value, RADIUS] = data["radius"]
+        for type_id, ground_range in RANGE_OVERRIDE.items():
+            self.table[type_id.value, GROUND_RANGE] = ground_range
+        for type_id, dps in DPS_OVERRIDE.items():
+            self.table[type_id.value, [GROUND_DPS, AIR_DPS]] = dps
+            self.hit_rate[type_id.value] = 0
+
+    def of(self, units: Units) -> np.ndarray:
+        """Stats of shape (units, columns), including attack and armor upgrades."""
+        type_values = np.array([u.type_id.value for u in units], dtype=np.intp)
+        stats = self.table[type_values]
+        attack_level = np.array([u.attack_upgrade_level for u in units], dtype=np.float32)
+        armor_level = np.array([u.armor_upgrade_level for u in units], dtype=np.float32)
+        # most weapons gain one damage per attack and level
+        stats[:, [GROUND_DPS, AIR_DPS]] += attack_level[:, None] * self.hit_rate[type_values]
+        stats[:, ARMOR] += armor_level
+        return stats
+
+    def strength(self, units: Units, targets: Units) -> float:
+        """
+        Fighting strength of the units against the targets by Lanchester's square law: total health and shields
+        times total dps, split between ground and air by the health of the targets and reduced by their armor.
+        """
+        if not units or not targets:
+            return 0.0
+        stats = self.of(units)
+        target_stats = self.of(targets)
+        target_health = np.array([t.health + t.shield for t in targets], dtype=np.float32)
+        if not (total := target_health.sum()):
+            return 0.0
+        flying = np.array([t.is_flying for t in targets], dtype=bool)
+        air_share = target_health[flying].sum() / total
+        armor = float(target_stats[:, ARMOR] @ target_health) / total
+        type_values = np.array([u.type_id.value for u in units], dtype=np.intp)
+        dps = np.maximum(stats[:, [GROUND_DPS, AIR_DPS]] - armor * self.hit_rate[type_values], 0.0)
+        health = sum(u.health + u.shield for u in units)
+        return float((dps @ [1 - air_share, air_share]).sum()) * health
+
+    def reach(self, units: Units, targets: Units) -> np.ndarray:
+        """
+        Distance between centers of shape (units, targets) within which each unit can attack each target,
+        -inf where it cannot attack the target at all.
+        """
+        stats = self.of(units)
+        flying = np.array([t.is_flying for t in targets], dtype=bool)[None, :]
+        target_radius = self.table[np.array([t.type_id.value for t in targets], dtype=np.intp), RADIUS]
+        dps = np.where(flying, stats[:, AIR_DPS, None], stats[:, GROUND_DPS, None])
+        weapon_range = np.where(flying, stats[:, AIR_RANGE, None], stats[:, GROUND_RANGE, None])
+        return np.where(0 < dps, weapon_range + stats[:, RADIUS, None] + target_radius[None, :], -np.inf)
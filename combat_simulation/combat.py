@@ -1,5 +1,10 @@
-from dataclasses import dataclass
+import lzma
+import os
+import pickle
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator
 
+import numpy as np
 from sc2.ids.unit_typeid import UnitTypeId
 from sc2.unit import Unit
 
@@ -52,3 +57,171 @@ class Combat:
 class CombatDataset:
     unit_types: list[UnitTypeId]
     combats: list[Combat]
+
+
+# per combat, side (own, enemy) and unit type
+UNIT_COLUMNS = {
+    "counts": np.int16,
+    "health": np.float32,
+    "shield": np.float32,
+    "ground_dps": np.float32,
+    "air_dps": np.float32,
+    "ground_range": np.float32,
+    "air_range": np.float32,
+}
+# per combat
+OUTCOME_COLUMNS = {
+    "win": np.bool_,
+    "winner_health": np.float32,
+    "result": np.float32,
+}
+UNIT_TYPES_FILE = "unit_types.npy"
+
+
+def combat_columns(unit_types: list[UnitTypeId], combats: list[Combat]) -> dict[str, np.ndarray]:
+    """
+    Flatten combats into fixed-width arrays.
+    Unit columns have shape (n, 2, len(unit_types)) and hold sums for counts, health, shield and dps,
+    and the maximum for ranges.
+    """
+    index = {t: i for i, t in enumerate(unit_types)}
+    shape = (len(combats), 2, len(unit_types))
+    columns = {column: np.zeros(shape, dtype=dtype) for column, dtype in UNIT_COLUMNS.items()}
+    for row, combat in enumerate(combats):
+        for side, units in enumerate((combat.setup.units, combat.setup.enemy_units)):
+            for unit in units:
+                i = row, side, index[unit.unit]
+                columns["counts"][i] += 1
+                columns["health"][i] += unit.health
+                columns["shield"][i] += unit.shield
+                columns["ground_dps"][i] += unit.ground_dps
+                columns["air_dps"][i] += unit.air_dps
+                columns["ground_range"][i] = max(columns["ground_range"][i], unit.ground_range)
+                columns["air_range"][i] = max(columns["air_range"][i], unit.air_range)
+    columns["win"] = np.array([c.outcome.win for c in combats], dtype=np.bool_)
+    columns["winner_health"] = np.array([c.outcome.winner_health for c in combats], dtype=np.float32)
+    columns["result"] = np.array([c.outcome.result for c in combats], dtype=np.float32)
+    return columns
+
+
+@dataclass
+class ColumnarCombatDataset:
+    """
+    Array-backed combat dataset, stored as one uncompressed .npy file per column in a directory.
+    Opening it memory-maps the columns, so nothing is loaded until it is indexed.
+    """
+
+    unit_types: list[UnitTypeId]
+    columns: dict[str, np.ndarray]
+
+    def __len__(self) -> int:
+        return len(self.columns["result"])
+
+    @classmethod
+    def open(cls, path: str, mmap_mode: str | None = "r") -> "ColumnarCombatDataset":
+        unit_types = [UnitTypeId(t) for t in np.load(os.path.join(path, UNIT_TYPES_FILE))]
+        columns = {
+            column: np.load(os.path.join(path, f"{column}.npy"), mmap_mode=mmap_mode)
+            for column in (*UNIT_COLUMNS, *OUTCOME_COLUMNS)
+        }
+        return ColumnarCombatDataset(unit_types, columns)
+
+    @classmethod
+    def from_combats(cls, dataset: CombatDataset) -> "ColumnarCombatDataset":
+        return ColumnarCombatDataset(dataset.unit_types, combat_columns(dataset.unit_types, dataset.combats))
+
+    def save(self, path: str) -> None:
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, UNIT_TYPES_FILE), np.array([t.value for t in self.unit_types], dtype=np.int32))
+        for column, values in self.columns.items():
+            np.save(os.path.join(path, f"{column}.npy"), values)
+
+    def batches(
+        self,
+        batch_size: int,
+        columns: Iterable[str] | None = None,
+        rng: np.random.Generator | None = None,
+    ) -> Iterator[dict[str, np.ndarray]]:
+        """Yield mini-batches of the selected columns, shuffled if a generator is given."""
+        selected = list(columns or self.columns)
+        order = rng.permutation(len(self)) if rng else np.arange(len(self))
+        for start in range(0, len(self), batch_size):
+            # sorted indices keep the reads from the memory map mostly sequential
+            rows = np.sort(order[start : start + batch_size])
+            yield {column: np.asarray(self.columns[column][rows]) for column in selected}
+
+
+def convert_pickle(input_path: str, output_path: str) -> ColumnarCombatDataset:
+    """Convert a dataset pickled by older versions of run_combat_sim.py."""
+    with lzma.open(input_path, "rb") as f:
+        dataset: CombatDataset = pickle.load(f)
+    columnar = ColumnarCombatDataset.from_combats(dataset)
+    columnar.save(output_path)
+    return columnar
+
+
+@dataclass
+class CombatShardWriter:
+    """Streams combats into chunk-compressed NPZ files in the columnar layout."""
+
+    prefix: str
+    unit_types: list[UnitTypeId]
+    chunk_size: int = 1_000
+    num_chunks: int = 0
+    _rows: list[Combat] = field(default_factory=list)
+
+    def append(self, combat: Combat) -> None:
+        self._rows.append(combat)
+        if self.chunk_size <= len(self._rows):
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._rows:
+            return
+        path = f"{self.prefix}-{self.num_chunks:05d}.npz"
+        np.savez_compressed(
+            path,
+            unit_types=np.array([t.value for t in self.unit_types], dtype=np.int32),
+            **combat_columns(self.unit_types, self._rows),
+        )
+        self.num_chunks += 1
+        self._rows.clear()
+
+
+def merge_shards(paths: Iterable[str], output_path: str) -> int:
+    """Write shards into a ColumnarCombatDataset directory one at a time, returns the number of combats."""
+    paths = sorted(paths)
+    if not paths:
+        raise Exception("No shards to merge")
+
+    unit_types = None
+    num_combats = 0
+    for path in paths:
+        with np.load(path) as shard:
+            if unit_types is None:
+                unit_types = shard["unit_types"]
+            elif not np.array_equal(unit_types, shard["unit_types"]):
+                raise Exception(f"Unit types of {path} do not match")
+            num_combats += len(shard["result"])
+
+    os.makedirs(output_path, exist_ok=True)
+    np.save(os.path.join(output_path, UNIT_TYPES_FILE), unit_types)
+    outputs = {
+        column: np.lib.format.open_memmap(
+            os.path.join(output_path, f"{column}.npy"),
+            mode="w+",
+            dtype=dtype,
+            shape=(num_combats, 2, len(unit_types)) if column in UNIT_COLUMNS else (num_combats,),
+        )
+        for column, dtype in (UNIT_COLUMNS | OUTCOME_COLUMNS).items()
+    }
+    offset = 0
+    for path in paths:
+        with np.load(path) as shard:
+            size = len(shard["result"])
+            for column, output in outputs.items():
+                output[offset : offset + size] = shard[column]
+            offset += size
+    for output in outputs.values():
+        output.flush()
+    return num_combats
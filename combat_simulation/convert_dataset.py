@@ -0,0 +1,11 @@
+import argparse
+
+from combat import convert_pickle
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert a pickled CombatDataset into the columnar format.")
+    parser.add_argument("input", help="LZMA pickle written by older versions of run_combat_sim.py")
+    parser.add_argument("output", help="output directory")
+    args = parser.parse_args()
+    dataset = convert_pickle(args.input, args.output)
+    print(f"Converted {len(dataset)} combats over {len(dataset.unit_types)} unit types")
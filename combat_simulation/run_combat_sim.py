@@ -1,12 +1,11 @@
-import lzma
+import argparse
 import os
-import pickle
-from dataclasses import asdict, dataclass
 from datetime import datetime
-from itertools import chain
+from glob import glob
+from multiprocessing import Pool
 
 import numpy as np
-from combat import Combat, CombatDataset, CombatOutcome, CombatSetup, CombatUnit
+from combat import Combat, CombatOutcome, CombatSetup, CombatShardWriter, CombatUnit, merge_shards
 from sc2 import maps
 from sc2.bot_ai import BotAI
 from sc2.data import Difficulty, Race, UnitTypeId
@@ -23,8 +22,6 @@ SET_SHIELDS = 3
 
 
 class CombatSimulationBot(BotAI):
-    timestamp = datetime.now().strftime("%Y-%m-%dT%H-%M-%S")
-    output_path = "dataset.xz"
     unit_types = {
         Race.Zerg: [
             UnitTypeId.BANELING,
@@ -70,20 +67,27 @@ class CombatSimulationBot(BotAI):
         ],
     }
     max_count = 1
-    num_combats = 10_000
+
+    def __init__(self, output_prefix: str, num_combats: int, seed: int, chunk_size: int, position: int = 0):
+        super().__init__()
+        self.output_prefix = output_prefix
+        self.num_combats = num_combats
+        self.rng = np.random.default_rng(seed)
+        self.chunk_size = chunk_size
+        self.position = position
 
     @property
     def all_unit_types(self) -> list[UnitTypeId]:
         return [t for r, ts in self.unit_types.items() for t in ts]
 
     def sample_army(self, units: Units) -> list[Unit]:
-        race = np.random.choice(list(self.unit_types.keys()))
-        complexity = np.random.choice((1, 2, 3))
-        composition = set(np.random.choice(list(self.unit_types[race]), replace=False, size=complexity))
+        race = self.rng.choice(list(self.unit_types.keys()))
+        complexity = self.rng.choice((1, 2, 3))
+        composition = set(self.rng.choice(list(self.unit_types[race]), replace=False, size=complexity))
         units = [
             units(u)[0]
             for u in composition
-            for _ in range(1 + np.random.poisson(12 / complexity))
+            for _ in range(1 + self.rng.poisson(12 / complexity))
         ]
         return units
 
@@ -104,8 +108,9 @@ class CombatSimulationBot(BotAI):
             await self.client.debug_create_unit([[t, self.max_count, position, 2] for t in self.all_unit_types])
 
         elif iteration == 2:
-            combats: list[Combat] = []
-            for _ in tqdm(range(self.num_combats)):
+            writer = CombatShardWriter(self.output_prefix, self.all_unit_types, self.chunk_size)
+            # disable=None turns the progress bar off when not attached to a terminal
+            for _ in tqdm(range(self.num_combats), position=self.position, disable=None):
                 units = self.sample_army(self.units)
                 enemy_units = self.sample_army(self.enemy_units)
 
@@ -135,29 +140,63 @@ class CombatSimulationBot(BotAI):
                     winner_health=winner_health,
                     result=result,
                 )
-                combats.append(
+                writer.append(
                     Combat(
                         setup=setup,
                         outcome=outcome,
                     )
                 )
-
-            dataset = CombatDataset(
-                unit_types=self.all_unit_types,
-                combats=combats,
-            )
-            with lzma.open(self.output_path, "wb") as f:
-                pickle.dump(dataset, f)
+            writer.flush()
 
             await self.client.leave()
 
 
-if __name__ == "__main__":
+def run_worker(output_dir: str, shard: int, num_combats: int, seed: int, chunk_size: int) -> None:
+    bot = CombatSimulationBot(
+        output_prefix=os.path.join(output_dir, f"shard-{shard:03d}"),
+        num_combats=num_combats,
+        seed=seed,
+        chunk_size=chunk_size,
+        position=shard,
+    )
     run_game(
         maps.get("SiteDelta513AIE"),
         [
-            Bot(Race.Terran, CombatSimulationBot()),
+            Bot(Race.Terran, bot),
             Computer(Race.Terran, Difficulty.VeryEasy),
         ],
         realtime=False,
     )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a combat dataset with one game per worker process.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--num-combats", type=int, default=10_000, help="total over all workers")
+    parser.add_argument("--chunk-size", type=int, default=1_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output-dir", default=datetime.now().strftime("dataset-%Y-%m-%dT%H-%M-%S"))
+    parser.add_argument(
+        "--output", default="dataset", help="merged dataset directory, relative to the output directory"
+    )
+    parser.add_argument("--merge-only", action="store_true")
+    args = parser.parse_args()
+
+    if not args.merge_only:
+        os.makedirs(args.output_dir, exist_ok=True)
+        # independent streams per worker derived from a single seed
+        seeds = np.random.SeedSequence(args.seed).generate_state(args.workers)
+        counts = [args.num_combats // args.workers + (i < args.num_combats % args.workers) for i in range(args.workers)]
+        with Pool(args.workers) as pool:
+            pool.starmap(
+                run_worker,
+                [(args.output_dir, i, counts[i], int(seeds[i]), args.chunk_size) for i in range(args.workers)],
+            )
+
+    shards = glob(os.path.join(args.output_dir, "shard-*.npz"))
+    num_combats = merge_shards(shards, os.path.join(args.output_dir, args.output))
+    print(f"Merged {len(shards)} shards with {num_combats} combats")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import argparse
+import os
+import sys
+
+import numpy as np
+import torch
+from combat import ColumnarCombatDataset
+from torch import nn
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from bot.combat_model import combat_features  # noqa: E402
+
+
+def dataset_features(dataset: ColumnarCombatDataset, rows: np.ndarray) -> np.ndarray:
+    columns = dataset.columns
+    return combat_features(columns["counts"][rows], columns["health"][rows] + columns["shield"][rows])
+
+
+def build_model(num_features: int, hidden: list[int]) -> nn.Sequential:
+    layers: list[nn.Module] = []
+    for size in hidden:
+        layers += [nn.Linear(num_features, size), nn.ReLU()]
+        num_features = size
+    layers += [nn.Linear(num_features, 1), nn.Tanh()]
+    return nn.Sequential(*layers)
+
+
+def export(model: nn.Sequential, dataset: ColumnarCombatDataset, mean: np.ndarray, std: np.ndarray, path: str):
+    """Save the weights for bot.combat_model.CombatModel, so the bot does not need torch."""
+    linear = [m for m in model if isinstance(m, nn.Linear)]
+    np.savez(
+        path,
+        unit_types=np.array([t.value for t in dataset.unit_types], dtype=np.int32),
+        mean=mean,
+        std=std,
+        num_layers=len(linear),
+        **{f"weight_{i}": m.weight.detach().numpy().T.copy() for i, m in enumerate(linear)},
+        **{f"bias_{i}": m.bias.detach().numpy().copy() for i, m in enumerate(linear)},
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the combat outcome model on a columnar combat dataset.")
+    parser.add_argument("dataset", help="dataset directory written by run_combat_sim.py")
+    parser.add_argument("--output", default="combat_model.npz")
+    parser.add_argument("--epochs", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--hidden", type=int, nargs="*", default=[64, 64])
+    parser.add_argument("--learning-rate", type=float, default=1e-3)
+    parser.add_argument("--validation", type=float, default=0.1, help="fraction held out")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    torch.manual_seed(args.seed)
+    dataset = ColumnarCombatDataset.open(args.dataset)
+
+    order = rng.permutation(len(dataset))
+    num_validation = int(args.validation * len(dataset))
+    validation, training = np.sort(order[:num_validation]), np.sort(order[num_validation:])
+
+    # normalization statistics from a sample keep memory flat on large datasets
+    sample = dataset_features(dataset, np.sort(rng.choice(training, min(len(training), 100_000), replace=False)))
+    mean = sample.mean(axis=0)
+    std = sample.std(axis=0) + 1e-6
+
+    def batches(rows: np.ndarray, shuffle: bool):
+        if shuffle:
+            rows = rng.permutation(rows)
+        for start in range(0, len(rows), args.batch_size):
+            batch = np.sort(rows[start : start + args.batch_size])
+            x = (dataset_features(dataset, batch) - mean) / std
+            y = np.asarray(dataset.columns["result"][batch])
+            yield torch.from_numpy(x), torch.from_numpy(y)
+
+    model = build_model(sample.shape[1], args.hidden)
+    optimizer = torch.optim.Adam(model.parameters(), lr=args.learning_rate)
+    loss_function = nn.MSELoss()
+
+    for epoch in range(args.epochs):
+        model.train()
+        for x, y in batches(training, shuffle=True):
+            optimizer.zero_grad()
+            loss = loss_function(model(x)[:, 0], y)
+            loss.backward()
+            optimizer.step()
+
+        model.eval()
+        with torch.no_grad():
+            errors = [((model(x)[:, 0] - y) ** 2).sum().item() for x, y in batches(validation, shuffle=False)]
+        print(f"epoch {epoch}: validation mse {sum(errors) / max(1, num_validation):.4f}")
+
+    export(model, dataset, mean, std, args.output)
+
+
+if __name__ == "__main__":
+    main()
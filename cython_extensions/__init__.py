@@ -9,44 +9,61 @@ from . import bootstrap
 # after that all other submodules can be loaded
 bootstrap.bootstrap_cython_submodules()
 
-from cython_extensions.combat_utils import (
-    cy_attack_ready,
-    cy_get_turn_speed,
-    cy_is_facing,
-    cy_pick_enemy_target,
-    cy_range_vs_target,
-    cy_find_aoe_position,
-    cy_adjust_moving_formation,
-)
-from cython_extensions.dijkstra import cy_dijkstra
-from cython_extensions.general_utils import cy_pylon_matrix_covers, cy_unit_pending
-from cython_extensions.geometry import (
-    cy_angle_diff,
-    cy_angle_to,
-    cy_distance_to,
-    cy_distance_to_squared,
-    cy_find_average_angle,
-    cy_find_correct_line,
-    cy_get_angle_between_points,
-    cy_towards,
-    cy_translate_point_along_line,
-)
-from cython_extensions.map_analysis import cy_flood_fill_grid, cy_get_bounding_box
-from cython_extensions.numpy_helper import (
-    cy_all_points_below_max_value,
-    cy_all_points_have_value,
-    cy_last_index_with_value,
-    cy_point_below_value,
-    cy_points_with_value,
-)
-from cython_extensions.placement_solver import (
-    cy_can_place_structure,
-    cy_find_building_locations,
-)
-from cython_extensions.units_utils import (
-    cy_center,
-    cy_closest_to,
-    cy_find_units_center_mass,
-    cy_in_attack_range,
-    cy_sorted_by_distance_to,
-)
+import importlib
+
+# submodules are only loaded when one of their functions is first accessed,
+# keeping process start cheap for code that imports from submodules directly
+_EXPORTS = {
+    "cy_attack_ready": "combat_utils",
+    "cy_get_turn_speed": "combat_utils",
+    "cy_is_facing": "combat_utils",
+    "cy_pick_enemy_target": "combat_utils",
+    "cy_range_vs_target": "combat_utils",
+    "cy_find_aoe_position": "combat_utils",
+    "cy_find_aoe_position_array": "combat_utils",
+    "cy_adjust_moving_formation": "combat_utils",
+    "cy_dijkstra": "dijkstra",
+    "cy_dijkstra_compact": "dijkstra",
+    "DijkstraSearch": "dijkstra",
+    "cy_pylon_matrix_covers": "general_utils",
+    "cy_unit_pending": "general_utils",
+    "cy_angle_diff": "geometry",
+    "cy_angle_to": "geometry",
+    "cy_distance_to": "geometry",
+    "cy_distance_to_squared": "geometry",
+    "cy_find_average_angle": "geometry",
+    "cy_find_correct_line": "geometry",
+    "cy_get_angle_between_points": "geometry",
+    "cy_towards": "geometry",
+    "cy_translate_point_along_line": "geometry",
+    "cy_flood_fill_grid": "map_analysis",
+    "cy_get_bounding_box": "map_analysis",
+    "cy_all_points_below_max_value": "numpy_helper",
+    "cy_all_points_have_value": "numpy_helper",
+    "cy_last_index_with_value": "numpy_helper",
+    "cy_point_below_value": "numpy_helper",
+    "cy_points_with_value": "numpy_helper",
+    "cy_blocked_integral": "placement_solver",
+    "cy_can_place_structure": "placement_solver",
+    "cy_find_building_locations": "placement_solver",
+    "cy_find_footprints": "placement_solver",
+    "cy_center": "units_utils",
+    "cy_closest_to": "units_utils",
+    "cy_find_units_center_mass": "units_utils",
+    "cy_in_attack_range": "units_utils",
+    "cy_sorted_by_distance_to": "units_utils",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if module := _EXPORTS.get(name):
+        value = getattr(importlib.import_module(f"{__name__}.{module}"), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
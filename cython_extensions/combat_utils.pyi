@@ -97,15 +97,16 @@ def cy_pick_enemy_target(enemies: Union[Units, list[Unit]]) -> Unit:
     ...
 
 def cy_find_aoe_position(
-    effect_radius: float, targets: Union[Units, list[Unit]], bonus_tags: set[int] = None
+    effect_radius: float,
+    targets: Union[Units, list[Unit]],
+    bonus_tags: set[int] = None,
+    min_units: int = 1,
 ) -> Optional[np.ndarray]:
     """Find best splash target given a group of enemies.
 
     Big thanks to idontcodethisgame for the original code in Eris
 
-    WARNING: Please don't spam this function, it's fine to use as required
-    but is costly. For example: only use this if unit ability is ready,
-    only if enemy are in combat range etc.
+    Deterministic and bounded in cost, see `cy_find_aoe_position_array`.
 
     Example:
     ```py
@@ -135,6 +136,7 @@ def cy_find_aoe_position(
         effect_radius: The radius of the effect (range).
         targets: All enemy units we would like to check.
         bonus_tags: If provided, give more value to these enemy tags.
+        min_units: Return None if fewer units would be hit.
 
     Returns:
         A 1D numpy array containing x and y coordinates of aoe position,
@@ -142,6 +144,44 @@ def cy_find_aoe_position(
     """
     ...
 
+def cy_find_aoe_position_array(
+    effect_radius: float,
+    positions: np.ndarray,
+    radii: np.ndarray,
+    weights: np.ndarray,
+) -> Optional[np.ndarray]:
+    """Find the position covering the highest total weight of circles.
+
+    A unit is hit if its center lies within `effect_radius + radius`.
+    The optimum lies on a unit center or on the intersection of two
+    of these reach circles, so all of them are scored exactly.
+    Pairs are formed among at most 48 units around the densest unit
+    center, which bounds the cost for large armies.
+
+    Example:
+    ```py
+    import numpy as np
+    from cython_extensions import cy_find_aoe_position_array
+
+    enemies = self.enemy_units
+    positions = np.array([u.position for u in enemies], dtype=np.float64)
+    radii = np.array([u.radius for u in enemies], dtype=np.float64)
+    weights = np.ones(len(enemies))
+    target = cy_find_aoe_position_array(1.375, positions, radii, weights)
+    ```
+
+    Args:
+        effect_radius: The radius of the effect (range).
+        positions: Array of shape (*, 2) with the unit positions.
+        radii: Unit radii.
+        weights: Value of hitting each unit.
+
+    Returns:
+        A 1D numpy array containing x and y coordinates of aoe position,
+        or None if there are no units.
+    """
+    ...
+
 def cy_adjust_moving_formation(
     our_units: Union[Units, list[Unit]],
     target: Union[Point2, tuple[float, float]],
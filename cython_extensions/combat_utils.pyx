@@ -1,11 +1,10 @@
 from libc.math cimport atan2, cos, exp, fabs, log, pi, sin, sqrt
+from cython import boundscheck, wraparound
 
 import numpy as np
 
 cimport numpy as np
 
-from scipy.optimize import differential_evolution
-
 from cython_extensions.geometry import cy_angle_diff, cy_angle_to, cy_distance_to
 from cython_extensions.map_analysis import cy_get_bounding_box
 from cython_extensions.turn_rate import TURN_RATE
@@ -211,76 +210,163 @@ cpdef dict cy_adjust_moving_formation(
     return unit_repositioning
 
 
-cdef double optimization_function(
-    const double[:] params,
-    object targets,
+DEF MAX_PAIRWISE_UNITS = 48
+
+
+@boundscheck(False)
+@wraparound(False)
+cdef double coverage(
+    double x,
+    double y,
+    const double[:, :] positions,
+    const double[:] reach_squared,
+    const double[:] weights
+) noexcept nogil:
+    cdef:
+        Py_ssize_t i
+        double dx, dy
+        double result = 0.0
+
+    for i in range(positions.shape[0]):
+        dx = positions[i, 0] - x
+        dy = positions[i, 1] - y
+        if dx * dx + dy * dy <= reach_squared[i]:
+            result += weights[i]
+    return result
+
+
+@boundscheck(False)
+@wraparound(False)
+cpdef np.ndarray cy_find_aoe_position_array(
     double effect_radius,
-    set bonus_tags
+    const double[:, :] positions,
+    const double[:] radii,
+    const double[:] weights,
 ):
     """
-    Function for optimization.
+    Deterministic AoE placement on plain arrays.
+    Candidates are unit centers and pairwise intersections of the reach circles,
+    only the MAX_PAIRWISE_UNITS units closest to the densest spot are paired up.
+    See full docs in `combat_utils.pyi`
     """
-    cdef double x = params[0]
-    cdef double y = params[1]
-    cdef double i, j, y_offset, dist, exponent, denominator, fraction, append_value
-    cdef double radius
-    cdef double result = 0.0
-    cdef double log_effect = log(1 + effect_radius)
-    cdef bint is_bonus_tag
-
-    for unit in targets:
-        is_bonus_tag = unit.tag in bonus_tags
-        if is_bonus_tag:
-            result += 2.0
-            continue
-        radius = unit.radius
-        i, j = unit.position
-
-        y_offset = log_effect + log(1 + radius)
-        dist = sqrt(((x - i) ** 2 + (y - j) ** 2))
-        exponent = 100 * (log(dist + 1) - y_offset)
-        denominator = 1 + exp(exponent)
-        fraction = 2 / denominator
-        append_value = -1.0 * (fraction - 1.0)
-        result += append_value
-    return result
+    cdef:
+        Py_ssize_t n = positions.shape[0]
+        Py_ssize_t i, j, k, m
+        double[:] reach = np.add(radii, effect_radius)
+        double[:] reach_squared = np.square(reach)
+        np.ndarray[np.intp_t, ndim=1] pool_array
+        Py_ssize_t[:] pool
+        double x, y, dx, dy, d, a, h, mx, my, score
+        double best_x = 0.0
+        double best_y = 0.0
+        double best_score = -1.0
+        double sum_x, sum_y, sum_w
+
+    if n == 0:
+        return None
+
+    # seed with the best unit center
+    with nogil:
+        for i in range(n):
+            score = coverage(positions[i, 0], positions[i, 1], positions, reach_squared, weights)
+            if score > best_score:
+                best_score = score
+                best_x = positions[i, 0]
+                best_y = positions[i, 1]
+
+    # bound the pairwise stage to the units around the densest center
+    if n > MAX_PAIRWISE_UNITS:
+        pool_array = np.argsort(
+            np.hypot(np.subtract(positions[:, 0], best_x), np.subtract(positions[:, 1], best_y)),
+            kind="stable",
+        )[:MAX_PAIRWISE_UNITS].astype(np.intp)
+    else:
+        pool_array = np.arange(n, dtype=np.intp)
+    pool = pool_array
+    m = pool.shape[0]
+
+    with nogil:
+        for i in range(m):
+            for j in range(i + 1, m):
+                dx = positions[pool[j], 0] - positions[pool[i], 0]
+                dy = positions[pool[j], 1] - positions[pool[i], 1]
+                d = sqrt(dx * dx + dy * dy)
+                if d == 0.0 or d > reach[pool[i]] + reach[pool[j]] or d < fabs(reach[pool[i]] - reach[pool[j]]):
+                    continue
+                a = (reach_squared[pool[i]] - reach_squared[pool[j]] + d * d) / (2 * d)
+                h = sqrt(max(0.0, reach_squared[pool[i]] - a * a))
+                mx = positions[pool[i], 0] + a * dx / d
+                my = positions[pool[i], 1] + a * dy / d
+                for k in range(2):
+                    # pull the intersection slightly inwards so both circles count it as covered
+                    x = mx + (1 - 2 * k) * h * dy / d * (1 - 1e-6)
+                    y = my - (1 - 2 * k) * h * dx / d * (1 - 1e-6)
+                    score = coverage(x, y, positions, reach_squared, weights)
+                    if score > best_score:
+                        best_score = score
+                        best_x = x
+                        best_y = y
+
+        # prefer the centroid of the hit units if it hits just as much, as it is more robust to movement
+        sum_x = 0.0
+        sum_y = 0.0
+        sum_w = 0.0
+        for i in range(n):
+            dx = positions[i, 0] - best_x
+            dy = positions[i, 1] - best_y
+            if dx * dx + dy * dy <= reach_squared[i]:
+                sum_x += weights[i] * positions[i, 0]
+                sum_y += weights[i] * positions[i, 1]
+                sum_w += weights[i]
+        if sum_w > 0.0:
+            x = sum_x / sum_w
+            y = sum_y / sum_w
+            if coverage(x, y, positions, reach_squared, weights) >= best_score:
+                best_x = x
+                best_y = y
+
+    return np.array((best_x, best_y))
 
-# Wrapper for the optimization function
-cdef double f_wrapper(
-    const double[:] params,
-    object targets,
-    double effect_radius,
-    set bonus_tags
-):
-    return optimization_function(params, targets, effect_radius, bonus_tags)
 
 cpdef cy_find_aoe_position(
     double effect_radius,
     object targets,
-    unsigned int min_units = 1,
     bonus_tags = None,
+    unsigned int min_units = 1,
 ):
     """
     Find the best place to put an AoE effect so that it hits the most units.
     """
-    cdef unsigned int len_targets = len(targets)
+    cdef:
+        unsigned int len_targets = len(targets)
+        np.ndarray[np.float64_t, ndim=2] positions
+        np.ndarray[np.float64_t, ndim=1] radii, weights
+        (double, double) position
+        double reach
+        unsigned int hits = 0
+        Py_ssize_t i
+
     if not bonus_tags:
         bonus_tags = set()
     if len_targets == 0:
         return None
-    elif len_targets == 1:
-        return targets.first.position
-
-    (x_min, x_max), (y_min, y_max) = cy_get_bounding_box({u.position_tuple for u in targets})
-    bounds = [(x_min, x_max), (y_min, y_max)]
 
-    result = differential_evolution(
-        f_wrapper,
-        bounds=bounds,
-        args=(targets, effect_radius, bonus_tags),
-        tol=1e-10
-    )
-    if result.success:
-        return result.x
-    else:
+    positions = np.empty((len_targets, 2), dtype=np.float64)
+    radii = np.empty(len_targets, dtype=np.float64)
+    weights = np.empty(len_targets, dtype=np.float64)
+    for i in range(len_targets):
+        unit = targets[i]
+        positions[i] = unit.position_tuple
+        radii[i] = unit.radius
+        weights[i] = 2.0 if unit.tag in bonus_tags else 1.0
+
+    result = cy_find_aoe_position_array(effect_radius, positions, radii, weights)
+
+    position = result[0], result[1]
+    for i in range(len_targets):
+        reach = effect_radius + radii[i]
+        if (positions[i, 0] - position[0]) ** 2 + (positions[i, 1] - position[1]) ** 2 <= reach * reach:
+            hits += 1
+    if hits < min_units:
         return None
+    return result
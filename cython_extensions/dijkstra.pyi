@@ -29,6 +29,144 @@ class DijkstraOutput:
         """
         ...
 
+class CompactDijkstraOutput:
+    """Result of Dijkstras algorithm with one direction code per cell instead of two pointer grids.
+
+    Attributes:
+        direction: Direction code grid of dtype uint8. Code k points to the neighbour
+            (x + NEIGHBOURS_X[k], y + NEIGHBOURS_Y[k]), 255 marks targets and unreachable cells.
+        distance: Distance grid of dtype float32, or None.
+
+    """
+
+    direction: np.ndarray
+    distance: np.ndarray | None
+
+    def get_path(
+        self, source: tuple[int, int], limit: int = 0
+    ) -> list[tuple[int, int]]:
+        """Follow the path from a given source by decoding the direction grid.
+
+        Args:
+            source: Start point.
+            limit: Maximum length of the returned path. Defaults to 0 indicating no limit.
+
+        Returns:
+            The lowest cost path from source to any of the targets.
+
+        """
+        ...
+
+    def get_paths(
+        self, sources: np.ndarray, limit: int = 0
+    ) -> list[list[tuple[int, int]]]:
+        """Follow the paths from many sources at once.
+
+        Args:
+            sources: Array of shape (*, 2) containing x and y coordinates of the start points.
+            limit: Maximum length of each returned path. Defaults to 0 indicating no limit.
+
+        Returns:
+            The lowest cost path for each source, in order.
+
+        """
+        ...
+
+    def get_path_ends(
+        self, sources: np.ndarray, limit: int = 0
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Follow the paths from many sources at once, returning only where they end and their lengths.
+
+        Consistent with `get_path`, that is `ends[i] == path[-1]` and `lengths[i] == len(path)`.
+
+        Args:
+            sources: Array of shape (*, 2) containing x and y coordinates of the start points.
+            limit: Maximum length of each path. Defaults to 0 indicating no limit.
+
+        Returns:
+            Endpoints of shape (*, 2) and path lengths of shape (*,).
+
+        """
+        ...
+
+class DijkstraSearch:
+    """Resumable Dijkstras algorithm which can be advanced in slices, spreading the work across frames.
+
+    Cells are settled in order of distance. Settled cells have their final distance and path,
+    and every reached cell points towards a settled one, so the partial field is usable at any time.
+
+    Example:
+    ```py
+    from cython_extensions import DijkstraSearch
+
+    search = DijkstraSearch(cost, targets)
+    search.advance_for(0.002)  # 2ms this frame, continue on the next frame
+    pathing = search.output()
+    ```
+
+    Args:
+        cost_grid: Cost grid. Entries must be positive. Set unpathable cells to infinity.
+        targets: Target array of shape (*, 2) containing x and y coordinates of the target points.
+        checks_enabled: Pass False to deactivate grid value and target coordinates checks. Defaults to True.
+
+    Attributes:
+        distance: Distance grid of dtype float64, infinite where not reached yet.
+        direction: Direction code grid of dtype uint8 as in `CompactDijkstraOutput`.
+        settled: Mask of dtype uint8 of cells whose distance is final.
+        num_settled: Number of settled cells.
+        done: Whether every reachable cell has been settled.
+
+    """
+
+    distance: np.ndarray
+    direction: np.ndarray
+    settled: np.ndarray
+    num_settled: int
+    done: bool
+
+    def __init__(
+        self, cost_grid: np.ndarray, targets: np.ndarray, checks_enabled: bool = True
+    ) -> None: ...
+    def advance(self, max_settled: int) -> bool:
+        """Settle up to a given number of cells.
+
+        Args:
+            max_settled: Maximum number of cells to settle in this call.
+
+        Returns:
+            Whether the search is complete.
+
+        """
+        ...
+
+    def advance_for(self, seconds: float, chunk: int = 1024) -> bool:
+        """Settle cells in chunks until the time slice is used up or the search is complete.
+
+        Args:
+            seconds: Time slice in seconds.
+            chunk: Number of cells settled between clock checks. Defaults to 1024.
+
+        Returns:
+            Whether the search is complete.
+
+        """
+        ...
+
+    def output(self, keep_distance: bool = True) -> CompactDijkstraOutput:
+        """Current field, usable for path queries while the search is incomplete.
+
+        Paths from cells which have not been reached yet have length 1.
+        The direction grid is shared with the search and keeps improving as it advances.
+
+        Args:
+            keep_distance: Pass False to omit the distance grid. Defaults to True.
+
+        Returns:
+            Pathfinding object containing direction codes and optionally distances.
+
+        """
+        ...
+
 def cy_dijkstra(
     cost_grid: np.ndarray, targets: np.ndarray, checks_enabled: bool = True
 ) -> DijkstraOutput:
@@ -57,3 +195,35 @@ def cy_dijkstra(
 
     """
     ...
+
+def cy_dijkstra_compact(
+    cost_grid: np.ndarray,
+    targets: np.ndarray,
+    checks_enabled: bool = True,
+    keep_distance: bool = True,
+) -> CompactDijkstraOutput:
+    """Run Dijkstras algorithm on a grid, storing one direction byte per cell instead of two pointer grids.
+
+    Uses 1 byte per cell (5 with distances) compared to 24 for `cy_dijkstra`.
+
+    Example:
+    ```py
+    from cython_extensions import cy_dijkstra_compact
+
+    pathing = cy_dijkstra_compact(cost, targets, keep_distance=False)
+    sources = np.array([u.position.rounded for u in bot.units], np.intp)
+    for unit, path in zip(bot.units, pathing.get_paths(sources, limit=7)):
+        unit.move(Point2(path[-1]))
+    ```
+
+    Args:
+        cost_grid: Cost grid. Entries must be positive. Set unpathable cells to infinity.
+        targets: Target array of shape (*, 2) containing x and y coordinates of the target points.
+        checks_enabled: Pass False to deactivate grid value and target coordinates checks. Defaults to True.
+        keep_distance: Pass False to discard the distance grid. Defaults to True.
+
+    Returns:
+        Pathfinding object containing direction codes and optionally distances.
+
+    """
+    ...
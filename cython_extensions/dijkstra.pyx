@@ -2,14 +2,21 @@ from cython import boundscheck, wraparound
 import numpy as np
 cimport numpy as cnp
 
-from libc.stdlib cimport malloc
+from time import perf_counter
+
+from libc.stdlib cimport free, malloc, realloc
 
 DEF HEAP_ARITY = 4
 
+DEF NO_DIRECTION = 255
+
 ctypedef cnp.float64_t DTYPE_t
+ctypedef cnp.uint8_t DIRECTION_t
 
 cdef Py_ssize_t[8] NEIGHBOURS_X = [-1, 1, 0, 0, -1, 1, -1, 1]
 cdef Py_ssize_t[8] NEIGHBOURS_Y = [0, 0, -1, 1, -1, -1, 1, 1]
+# index of the neighbour in the opposite direction
+cdef DIRECTION_t[8] OPPOSITE = [1, 0, 3, 2, 7, 6, 5, 4]
 cdef DTYPE_t SQRT2 = np.sqrt(2)
 cdef DTYPE_t[8] NEIGHBOURS_D = [1, 1, 1, 1, SQRT2, SQRT2, SQRT2, SQRT2]
 
@@ -69,46 +76,153 @@ cdef class DijkstraOutput:
         return path
 
 
+cdef class CompactDijkstraOutput:
+    cdef public DIRECTION_t[:, :] direction
+    """Direction code grid, code k points to the neighbour (x + NEIGHBOURS_X[k], y + NEIGHBOURS_Y[k])."""
+    cdef public object distance
+    """Distance grid in single precision, or None."""
+    def __cinit__(self, DIRECTION_t[:, :] direction, object distance):
+        self.direction = direction
+        self.distance = distance
+
+    @boundscheck(False)
+    @wraparound(False)
+    cpdef get_path(self, (int, int) source, int limit=0):
+        """
+
+        Follow the path from a given source by decoding the direction grid.
+
+        Parameters
+        ----------
+        source :
+            Start point.
+        limit :
+            Maximum length of the returned path. Defaults to 0 indicating no limit.
+
+        Returns
+        -------
+        list[tuple[int, int]] :
+            The lowest cost path from source to any of the targets.
+
+        """
+        cdef:
+            Py_ssize_t x, y
+            DIRECTION_t k
+        path = list[tuple[int, int]]()
+        x, y = source
+        if x < 0 or y < 0 or self.direction.shape[0] <= x or self.direction.shape[1] <= y:
+            return path
+        if limit == 0:
+            # a path longer than this must contain a cycle, so it should never be hit anyway
+            limit = self.direction.shape[0] * self.direction.shape[1]
+
+        path.append((x, y))
+        while len(path) < limit:
+            k = self.direction[x, y]
+            if k == NO_DIRECTION:
+                break
+            x += NEIGHBOURS_X[k]
+            y += NEIGHBOURS_Y[k]
+            path.append((x, y))
+        return path
+
+    @boundscheck(False)
+    @wraparound(False)
+    cpdef get_paths(self, Py_ssize_t[:, :] sources, int limit=0):
+        """
+
+        Follow the paths from many sources at once.
+
+        Parameters
+        ----------
+        sources :
+            Array of shape (*, 2) containing x and y coordinates of the start points.
+        limit :
+            Maximum length of each returned path. Defaults to 0 indicating no limit.
+
+        Returns
+        -------
+        list[list[tuple[int, int]]] :
+            The lowest cost path for each source, in order.
+
+        """
+        cdef Py_ssize_t i
+        return [self.get_path((sources[i, 0], sources[i, 1]), limit) for i in range(sources.shape[0])]
+
+    @boundscheck(False)
+    @wraparound(False)
+    def get_path_ends(self, Py_ssize_t[:, :] sources, int limit=0):
+        """
+
+        Follow the paths from many sources at once, returning only where they end and their lengths.
+        Consistent with `get_path`, that is ends[i] == path[-1] and lengths[i] == len(path).
+
+        Parameters
+        ----------
+        sources :
+            Array of shape (*, 2) containing x and y coordinates of the start points.
+        limit :
+            Maximum length of each path. Defaults to 0 indicating no limit.
+
+        Returns
+        -------
+        tuple[np.ndarray, np.ndarray] :
+            Endpoints of shape (*, 2) and path lengths of shape (*,).
+
+        """
+        cdef:
+            Py_ssize_t i, x, y, length
+            Py_ssize_t n = sources.shape[0]
+            Py_ssize_t max_length = limit or self.direction.shape[0] * self.direction.shape[1]
+            DIRECTION_t k
+            DIRECTION_t[:, :] direction = self.direction
+            Py_ssize_t[:, :] ends = np.array(sources, dtype=np.intp)
+            Py_ssize_t[:] lengths = np.zeros(n, np.intp)
+
+        with nogil:
+            for i in range(n):
+                x = sources[i, 0]
+                y = sources[i, 1]
+                if x < 0 or y < 0 or direction.shape[0] <= x or direction.shape[1] <= y:
+                    continue
+                length = 1
+                while length < max_length:
+                    k = direction[x, y]
+                    if k == NO_DIRECTION:
+                        break
+                    x += NEIGHBOURS_X[k]
+                    y += NEIGHBOURS_Y[k]
+                    length += 1
+                ends[i, 0] = x
+                ends[i, 1] = y
+                lengths[i] = length
+
+        return ends.base, lengths.base
+
+
 @boundscheck(False)
 @wraparound(False)
-cpdef DijkstraOutput cy_dijkstra(
+cdef tuple _dijkstra_search(
     DTYPE_t[:, :] cost,
     Py_ssize_t[:, :] targets,
-    bint checks_enabled = True,
+    bint checks_enabled,
 ):
-    """
-
-    Run Dijkstras algorithm on a grid, yielding many-target-shortest paths for each position.
-
-    Parameters
-    ----------
-    cost :
-        Cost grid. Entries must be positive. Set unpathable cells to infinity.
-    targets :
-        Target array of shape (*, 2) containing x and y coordinates of the target points.
-    checks_enabled :
-        Pass False to deactivate grid value and target coordinates checks. Defaults to True.
-
-    Returns
-    -------
-    DijkstraOutput :
-        Pathfinding object containing containing distance and forward pointer grids.
-
-    """
+    # returns the direction code and distance grids
 
     cdef:
-        PriorityQueueItem* pq
+        PriorityQueueItem* heap
+        PriorityQueueItem* grown
         PriorityQueueItem root
         Py_ssize_t i, swap, index, parent
 
         PriorityQueueItem u
-        Py_ssize_t capacity, size
+        Py_ssize_t capacity, size, child, k
         Py_ssize_t x, y, x2, y2
+        Py_ssize_t width = cost.shape[0], height = cost.shape[1]
         DTYPE_t c, alternative
-        DTYPE_t[:, :] cost_padded = np.pad(cost, 1, "constant", constant_values=np.inf)
+        bint out_of_memory = False
         DTYPE_t[:, :] distance = np.full_like(cost, np.inf)
-        Py_ssize_t[:, :] forward_x = np.full_like(cost, -1, np.intp)
-        Py_ssize_t[:, :] forward_y = np.full_like(cost, -1, np.intp)
+        DIRECTION_t[:, :] direction = np.full_like(cost, NO_DIRECTION, np.uint8)
 
     if checks_enabled:
         if np.any(np.less_equal(cost, 0.0)):
@@ -121,8 +235,10 @@ cpdef DijkstraOutput cy_dijkstra(
         )):
             raise Exception(f"Target out of bounds")
 
-    capacity = cost.size
+    capacity = max(cost.size, targets.shape[0])
     heap = <PriorityQueueItem*>malloc(capacity * sizeof(PriorityQueueItem))
+    if heap == NULL:
+        raise MemoryError()
     size = targets.shape[0]
 
     # initialize queue with targets
@@ -145,46 +261,344 @@ cpdef DijkstraOutput cy_dijkstra(
             else:
                 break
 
-    while size != 0:
+    with nogil:
+        while size != 0 and not out_of_memory:
+
+            u = heap[0]
+            x = u.x
+            y = u.y
+
+            # dequeue
+            size -= 1
+            heap[0] = heap[size]
+            index = 0
+            while True:
+                swap = index
+                i = HEAP_ARITY * index + 1
+                for child in range(i, i + min(HEAP_ARITY, size - i)):
+                    if heap[child].distance < heap[swap].distance:
+                        swap = child
+                if swap != index:
+                    heap[index], heap[swap] = heap[swap], heap[index]
+                    index = swap
+                else:
+                    break
+
+            # skip outdated queue entries
+            if distance[x, y] < u.distance:
+                continue
+
+            for k in range(8):
+                x2 = x + NEIGHBOURS_X[k]
+                y2 = y + NEIGHBOURS_Y[k]
+                if x2 < 0 or y2 < 0 or width <= x2 or height <= y2:
+                    continue
+                alternative = distance[x, y] + NEIGHBOURS_D[k] * cost[x2, y2]
+                if alternative < distance[x2, y2]:
+                    distance[x2, y2] = alternative
+                    direction[x2, y2] = OPPOSITE[k]
+
+                    # enqueue, cells can be queued more than once
+                    if size == capacity:
+                        grown = <PriorityQueueItem*>realloc(heap, 2 * capacity * sizeof(PriorityQueueItem))
+                        if grown == NULL:
+                            out_of_memory = True
+                            break
+                        heap = grown
+                        capacity *= 2
+                    index = size
+                    size += 1
+                    heap[index] = PriorityQueueItem(x2, y2, alternative)
+                    while index != 0:
+                        parent = (index - 1) // HEAP_ARITY
+                        if heap[index].distance < heap[parent].distance:
+                            heap[index], heap[parent] = heap[parent], heap[index]
+                            index = parent
+                        else:
+                            break
+
+    free(heap)
+    if out_of_memory:
+        raise MemoryError()
+    return direction.base, distance.base
+
+@boundscheck(False)
+@wraparound(False)
+cpdef DijkstraOutput cy_dijkstra(
+    DTYPE_t[:, :] cost,
+    Py_ssize_t[:, :] targets,
+    bint checks_enabled = True,
+):
+    """
+
+    Run Dijkstras algorithm on a grid, yielding many-target-shortest paths for each position.
+
+    Parameters
+    ----------
+    cost :
+        Cost grid. Entries must be positive. Set unpathable cells to infinity.
+    targets :
+        Target array of shape (*, 2) containing x and y coordinates of the target points.
+    checks_enabled :
+        Pass False to deactivate grid value and target coordinates checks. Defaults to True.
+
+    Returns
+    -------
+    DijkstraOutput :
+        Pathfinding object containing containing distance and forward pointer grids.
+
+    """
+
+    cdef:
+        Py_ssize_t x, y
+        DIRECTION_t k
+        DIRECTION_t[:, :] direction
+        Py_ssize_t[:, :] forward_x = np.full_like(cost, -1, np.intp)
+        Py_ssize_t[:, :] forward_y = np.full_like(cost, -1, np.intp)
+
+    direction_array, distance = _dijkstra_search(cost, targets, checks_enabled)
+    direction = direction_array
+
+    with nogil:
+        for x in range(direction.shape[0]):
+            for y in range(direction.shape[1]):
+                k = direction[x, y]
+                if k != NO_DIRECTION:
+                    forward_x[x, y] = x + NEIGHBOURS_X[k]
+                    forward_y[x, y] = y + NEIGHBOURS_Y[k]
+
+    return DijkstraOutput(forward_x, forward_y, distance)
+
+
+cpdef CompactDijkstraOutput cy_dijkstra_compact(
+    DTYPE_t[:, :] cost,
+    Py_ssize_t[:, :] targets,
+    bint checks_enabled = True,
+    bint keep_distance = True,
+):
+    """
+
+    Run Dijkstras algorithm on a grid, storing one direction byte per cell instead of two pointer grids.
+
+    Parameters
+    ----------
+    cost :
+        Cost grid. Entries must be positive. Set unpathable cells to infinity.
+    targets :
+        Target array of shape (*, 2) containing x and y coordinates of the target points.
+    checks_enabled :
+        Pass False to deactivate grid value and target coordinates checks. Defaults to True.
+    keep_distance :
+        Pass False to discard the distance grid. Defaults to True.
+
+    Returns
+    -------
+    CompactDijkstraOutput :
+        Pathfinding object containing direction codes and optionally distances.
+
+    """
+    direction, distance = _dijkstra_search(cost, targets, checks_enabled)
+    return CompactDijkstraOutput(direction, distance.astype(np.float32) if keep_distance else None)
+
 
-        x = heap[0].x
-        y = heap[0].y
+cdef class DijkstraSearch:
+    """
+
+    Resumable Dijkstra search which can be advanced in slices, keeping its priority queue between calls.
+    Cells settled so far have their final distance and path, the remaining reached cells have a valid path
+    through settled cells which may still improve.
+
+    """
+    cdef DTYPE_t[:, :] cost
+    cdef public DTYPE_t[:, :] distance
+    """Distance grid, infinite where not reached yet."""
+    cdef public DIRECTION_t[:, :] direction
+    """Direction code grid as in CompactDijkstraOutput."""
+    cdef public cnp.uint8_t[:, :] settled
+    """Mask of cells whose distance is final."""
+    cdef PriorityQueueItem* heap
+    cdef Py_ssize_t size, capacity
+    cdef public Py_ssize_t num_settled
+    """Number of settled cells."""
+
+    def __cinit__(self, DTYPE_t[:, :] cost, Py_ssize_t[:, :] targets, bint checks_enabled = True):
+        cdef Py_ssize_t i, x, y
+
+        if checks_enabled:
+            if np.any(np.less_equal(cost, 0.0)):
+                raise Exception("invalid cost: entries must be strictly positive")
+
+            if any((
+                np.less(targets, 0).any(),
+                np.greater_equal(targets[:, 0], cost.shape[0]).any(),
+                np.greater_equal(targets[:, 1], cost.shape[1]).any(),
+            )):
+                raise Exception(f"Target out of bounds")
+
+        self.cost = cost
+        self.distance = np.full_like(cost, np.inf)
+        self.direction = np.full_like(cost, NO_DIRECTION, np.uint8)
+        self.settled = np.zeros_like(cost, np.uint8)
+        self.num_settled = 0
+        self.size = 0
+        self.capacity = max(16, targets.shape[0])
+        self.heap = <PriorityQueueItem*>malloc(self.capacity * sizeof(PriorityQueueItem))
+        if self.heap == NULL:
+            raise MemoryError()
+
+        for i in range(targets.shape[0]):
+            x = targets[i, 0]
+            y = targets[i, 1]
+            if cost[x, y] < self.distance[x, y]:
+                self.distance[x, y] = cost[x, y]
+                self._push(PriorityQueueItem(x, y, cost[x, y]))
+
+    def __dealloc__(self):
+        free(self.heap)
+
+    @property
+    def done(self) -> bool:
+        """Whether every reachable cell has been settled."""
+        return self.size == 0
+
+    @boundscheck(False)
+    @wraparound(False)
+    cdef inline int _push(self, PriorityQueueItem item) noexcept nogil:
+        cdef:
+            Py_ssize_t index, parent
+            PriorityQueueItem* grown
+        if self.size == self.capacity:
+            # entries are pushed lazily on every improvement, so the queue may outgrow the grid
+            grown = <PriorityQueueItem*>realloc(self.heap, 2 * self.capacity * sizeof(PriorityQueueItem))
+            if grown == NULL:
+                return -1
+            self.heap = grown
+            self.capacity *= 2
+        index = self.size
+        self.size += 1
+        self.heap[index] = item
+        while index != 0:
+            parent = (index - 1) // HEAP_ARITY
+            if self.heap[index].distance < self.heap[parent].distance:
+                self.heap[index], self.heap[parent] = self.heap[parent], self.heap[index]
+                index = parent
+            else:
+                break
+        return 0
 
-        # dequeue
-        size -= 1
-        heap[0] = heap[size]
-        index = 0
+    @boundscheck(False)
+    @wraparound(False)
+    cdef inline PriorityQueueItem _pop(self) noexcept nogil:
+        cdef:
+            PriorityQueueItem root = self.heap[0]
+            Py_ssize_t index = 0, swap, child, i
+        self.size -= 1
+        self.heap[0] = self.heap[self.size]
         while True:
             swap = index
             i = HEAP_ARITY * index + 1
-            for child in range(i, i + min(HEAP_ARITY, size - i)):
-                if heap[child].distance < heap[swap].distance:
+            for child in range(i, i + min(HEAP_ARITY, self.size - i)):
+                if self.heap[child].distance < self.heap[swap].distance:
                     swap = child
             if swap != index:
-                heap[index], heap[swap] = heap[swap], heap[index]
+                self.heap[index], self.heap[swap] = self.heap[swap], self.heap[index]
                 index = swap
             else:
                 break
+        return root
 
-        for k in range(8):
-            x2 = x + NEIGHBOURS_X[k]
-            y2 = y + NEIGHBOURS_Y[k]
-            alternative = distance[x, y] + NEIGHBOURS_D[k] * cost_padded[x2+1, y2+1]
-            if alternative < distance[x2, y2]:
-                distance[x2, y2] = alternative
-                forward_x[x2, y2] = x
-                forward_y[x2, y2] = y
-
-                # enqueue
-                index = size
-                size += 1
-                heap[index] = PriorityQueueItem(x2, y2, alternative)
-                while index != 0:
-                    parent = (index - 1) // HEAP_ARITY
-                    if heap[index].distance < heap[parent].distance:
-                        heap[index], heap[parent] = heap[parent], heap[index]
-                        index = parent
-                    else:
-                        break
+    @boundscheck(False)
+    @wraparound(False)
+    cpdef bint advance(self, Py_ssize_t max_settled):
+        """
+
+        Settle up to a given number of cells.
+
+        Parameters
+        ----------
+        max_settled :
+            Maximum number of cells to settle in this call.
+
+        Returns
+        -------
+        bool :
+            Whether the search is complete.
+
+        """
+        cdef:
+            PriorityQueueItem u
+            Py_ssize_t x, y, x2, y2, k
+            Py_ssize_t width = self.cost.shape[0], height = self.cost.shape[1]
+            Py_ssize_t target = self.num_settled + max_settled
+            DTYPE_t alternative
+            int status = 0
+
+        with nogil:
+            while self.size != 0 and self.num_settled < target and status == 0:
+                u = self._pop()
+                x = u.x
+                y = u.y
+                # skip outdated queue entries
+                if self.settled[x, y] or self.distance[x, y] < u.distance:
+                    continue
+                self.settled[x, y] = 1
+                self.num_settled += 1
+
+                for k in range(8):
+                    x2 = x + NEIGHBOURS_X[k]
+                    y2 = y + NEIGHBOURS_Y[k]
+                    if x2 < 0 or y2 < 0 or width <= x2 or height <= y2 or self.settled[x2, y2]:
+                        continue
+                    alternative = u.distance + NEIGHBOURS_D[k] * self.cost[x2, y2]
+                    if alternative < self.distance[x2, y2]:
+                        self.distance[x2, y2] = alternative
+                        self.direction[x2, y2] = OPPOSITE[k]
+                        status = self._push(PriorityQueueItem(x2, y2, alternative))
+
+        if status != 0:
+            raise MemoryError()
+        return self.size == 0
+
+    def advance_for(self, double seconds, Py_ssize_t chunk = 1024):
+        """
+
+        Settle cells in chunks until the time slice is used up or the search is complete.
+
+        Parameters
+        ----------
+        seconds :
+            Time slice in seconds.
+        chunk :
+            Number of cells settled between clock checks. Defaults to 1024.
+
+        Returns
+        -------
+        bool :
+            Whether the search is complete.
 
-    return DijkstraOutput(forward_x, forward_y, distance)
\ No newline at end of file
+        """
+        deadline = perf_counter() + seconds
+        while not self.advance(chunk):
+            if deadline <= perf_counter():
+                return False
+        return True
+
+    def output(self, bint keep_distance = True):
+        """
+
+        Current field, usable for path queries while the search is incomplete.
+        The direction grid is shared with the search and keeps improving as it advances.
+
+        Parameters
+        ----------
+        keep_distance :
+            Pass False to omit the distance grid. Defaults to True.
+
+        Returns
+        -------
+        CompactDijkstraOutput :
+            Pathfinding object containing direction codes and optionally distances.
+
+        """
+        distance = np.asarray(self.distance, dtype=np.float32) if keep_distance else None
+        return CompactDijkstraOutput(self.direction, distance)
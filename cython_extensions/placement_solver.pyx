@@ -1,5 +1,4 @@
 import numpy as np
-from scipy.signal import convolve2d
 
 cimport cython
 cimport numpy as np
@@ -40,6 +39,100 @@ cpdef bint cy_can_place_structure(
                 return 0
     return 1
 
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cpdef np.ndarray cy_blocked_integral(
+    const unsigned char[:, :] creep_grid,
+    const unsigned char[:, :] placement_grid,
+    const unsigned char[:, :] pathing_grid,
+    const unsigned char[:, :] points_to_avoid_grid,
+    bint avoid_creep = 1
+):
+    """
+    Summed-area table of blocked cells, shape (height + 1, width + 1)
+    See full docs in `placement_solver.pyi`
+    """
+    cdef:
+        Py_ssize_t height = placement_grid.shape[0]
+        Py_ssize_t width = placement_grid.shape[1]
+        unsigned char creep_check = 0 if avoid_creep else 1
+        np.ndarray[np.int32_t, ndim=2] table_array = np.zeros((height + 1, width + 1), dtype=np.int32)
+        np.int32_t[:, :] table = table_array
+        np.int32_t blocked
+        Py_ssize_t x, y
+
+    with nogil:
+        for y in range(height):
+            for x in range(width):
+                if (
+                    points_to_avoid_grid[y, x] == 0
+                    and creep_grid[y, x] == creep_check
+                    and placement_grid[y, x] == 1
+                    and pathing_grid[y, x] == 1
+                ):
+                    blocked = 0
+                else:
+                    blocked = 1
+                table[y + 1, x + 1] = blocked + table[y, x + 1] + table[y + 1, x] - table[y, x]
+    return table_array
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef inline np.int32_t blocked_in_footprint(
+    const np.int32_t[:, :] table,
+    Py_ssize_t x,
+    Py_ssize_t y,
+    Py_ssize_t width,
+    Py_ssize_t height
+) noexcept nogil:
+    return table[y + height, x + width] - table[y, x + width] - table[y + height, x] + table[y, x]
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cpdef list cy_find_footprints(
+    const np.int32_t[:, :] blocked_integral,
+    list footprints,
+    (unsigned int, unsigned int) x_bounds,
+    (unsigned int, unsigned int) y_bounds
+):
+    """
+    Find all free origins for several footprint sizes in a single pass
+    See full docs in `placement_solver.pyi`
+    """
+    cdef:
+        Py_ssize_t num_footprints = len(footprints)
+        Py_ssize_t x_min = x_bounds[0]
+        Py_ssize_t y_min = y_bounds[0]
+        # bounds are inclusive, clip them to the grid
+        Py_ssize_t x_max = min(<Py_ssize_t>x_bounds[1] + 1, blocked_integral.shape[1] - 1)
+        Py_ssize_t y_max = min(<Py_ssize_t>y_bounds[1] + 1, blocked_integral.shape[0] - 1)
+        Py_ssize_t capacity = max(0, x_max - x_min) * max(0, y_max - y_min)
+        np.ndarray[np.intp_t, ndim=2] size_array = np.array(footprints, dtype=np.intp).reshape(-1, 2)
+        np.ndarray[np.intp_t, ndim=3] origins_array = np.empty((num_footprints, capacity, 2), dtype=np.intp)
+        np.ndarray[np.intp_t, ndim=1] counts_array = np.zeros(num_footprints, dtype=np.intp)
+        Py_ssize_t[:, :] sizes = size_array
+        Py_ssize_t[:, :, :] origins = origins_array
+        Py_ssize_t[:] counts = counts_array
+        Py_ssize_t k, x, y, w, h
+
+    with nogil:
+        for x in range(x_min, x_max):
+            for y in range(y_min, y_max):
+                for k in range(num_footprints):
+                    w = sizes[k, 0]
+                    h = sizes[k, 1]
+                    if x + w > x_max or y + h > y_max:
+                        continue
+                    if blocked_in_footprint(blocked_integral, x, y, w, h) == 0:
+                        origins[k, counts[k], 0] = x
+                        origins[k, counts[k], 1] = y
+                        counts[k] += 1
+
+    return [origins_array[k, :counts_array[k]].copy() for k in range(num_footprints)]
+
+
 @cython.boundscheck(False)  # Deactivate bounds checking
 @cython.wraparound(False)   # Deactivate negative indexing.
 cpdef list cy_find_building_locations(
@@ -54,43 +147,38 @@ cpdef list cy_find_building_locations(
     const unsigned char[:, :] points_to_avoid_grid,
     unsigned int building_width,
     unsigned int building_height,
-    bint avoid_creep = 1
+    bint avoid_creep = 1,
+    blocked_integral = None
 ):
     """
-    Use a convolution pass to find all possible building locations in an area
+    Use a summed-area table to find all possible building locations in an area
     See full docs in `placement_solver.pyi`
-    64.8 µs ± 4.05 µs per loop (mean ± std. dev. of 1000 runs, 10 loops each)
     """
     cdef:
-        unsigned int _x = 0
-        unsigned int _y = 0
-        unsigned int valid_idx = 0
-        float x, y
         int x_min = x_bounds[0]
-        int x_max = x_bounds[1]
         int y_min = y_bounds[0]
-        int y_max = y_bounds[1]
-        unsigned char[:, :] to_convolve = np.ones((x_max - x_min + 1, y_max - y_min + 1), dtype=np.uint8)
-        (float, float) [500] valid_spots
-        (float, float) center
+        Py_ssize_t kernel_x = kernel.shape[0]
+        Py_ssize_t kernel_y = kernel.shape[1]
+        Py_ssize_t num_x = <Py_ssize_t>x_bounds[1] - x_min + 2 - kernel_x
+        Py_ssize_t num_y = <Py_ssize_t>y_bounds[1] - y_min + 2 - kernel_y
         float half_width = building_width / 2
-        unsigned int creep_check = 0 if avoid_creep else 1
         unsigned int found_this_many_on_y = 0
+        const np.int32_t[:, :] table
         Py_ssize_t i, j
 
-    blocked_y = set()
-
-    for i in range(x_min, x_max + 1):
-        for j in range(y_min, y_max + 1):
-            if points_to_avoid_grid[j][i] == 0 and creep_grid[j][i] == creep_check and placement_grid[j][i] == 1 and pathing_grid[j][i] == 1:
-                to_convolve[i - x_min][j - y_min] = 0
+    if blocked_integral is None:
+        blocked_integral = cy_blocked_integral(
+            creep_grid, placement_grid, pathing_grid, points_to_avoid_grid, avoid_creep
+        )
+    table = blocked_integral
 
-    cdef unsigned char[:, :] result = convolve2d(to_convolve, kernel, mode="valid")
+    valid_spots = []
+    blocked_y = set()
 
-    for i in range(0, result.shape[0], x_stride):
+    for i in range(0, num_x, x_stride):
         found_this_many_on_y = 0
-        for j in range(0, result.shape[1], y_stride):
-            if result[i][j] == 0:
+        for j in range(0, num_y, y_stride):
+            if blocked_in_footprint(table, i + x_min, j + y_min, kernel_x, kernel_y) == 0:
                 if j in blocked_y:
                     continue
 
@@ -100,16 +188,7 @@ cpdef list cy_find_building_locations(
                     blocked_y.add(j)
                     continue
 
-                x = i + x_min + half_width
-                y = j + y_min + half_width
-
                 # valid building placement is building center, so add half to x and y
-                valid_spots[valid_idx][0] = x
-                valid_spots[valid_idx][1] = y
-                valid_idx += 1
-
-    if valid_idx == 0:
-        return []
-
-    return list(valid_spots)[:valid_idx]
+                valid_spots.append((i + x_min + half_width, j + y_min + half_width))
 
+    return valid_spots
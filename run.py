@@ -13,8 +13,6 @@ sys.path.append("ares-sc2/src/ares")
 sys.path.append("ares-sc2/src")
 sys.path.append("ares-sc2")
 
-import yaml
-
 from bot.main import TwelvePoolBot
 from ladder import run_ladder_game
 
@@ -39,6 +37,8 @@ def main():
     user_config_path: str = path.join(__user_config_location__, CONFIG_FILE)
     # attempt to get race and bot name from config file if they exist
     if path.isfile(user_config_path):
+        import yaml
+
         with open(user_config_path) as config_file:
             config: dict = yaml.safe_load(config_file)
             if MY_BOT_NAME in config:
@@ -30,6 +30,7 @@ ZIP_FILES: List[str] = [
     "protoss_builds.yaml",
     "zerg_builds.yml",
     "zerg_builds.yaml",
+    "combat_model.npz",
 ]
 if platform.system() == "Windows":
     EXCLUDE: list[str] = [
@@ -0,0 +1,76 @@
+"""
+Measures how long the ladder entry point takes to import the bot
+and which top level packages account for it, using `python -X importtime`.
+Exits with a non-zero status when the import exceeds the budget.
+"""
+import argparse
+import re
+import subprocess
+import sys
+import time
+from collections import Counter
+from os import path
+
+ROOT_DIRECTORY = path.dirname(path.dirname(path.abspath(__file__)))
+# mirrors the sys.path setup in run.py
+IMPORT_SCRIPT: str = "\n".join(
+    [
+        "import sys",
+        "sys.path.append('ares-sc2/src/ares')",
+        "sys.path.append('ares-sc2/src')",
+        "sys.path.append('ares-sc2')",
+        "import bot.main",
+    ]
+)
+IMPORT_TIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def measure_import() -> tuple[float, Counter[str], Counter[str]]:
+    """Wall time in seconds, and self time / cumulative time in microseconds per top level package."""
+    start = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", IMPORT_SCRIPT],
+        cwd=ROOT_DIRECTORY,
+        capture_output=True,
+        text=True,
+    )
+    wall_time = time.perf_counter() - start
+    if process.returncode != 0:
+        raise Exception(f"Importing the bot failed:\n{process.stderr}")
+
+    self_time = Counter[str]()
+    cumulative_time = Counter[str]()
+    for line in process.stderr.splitlines():
+        if not (match := IMPORT_TIME_LINE.match(line)):
+            continue
+        package = match.group(4).split(".")[0]
+        self_time[package] += int(match.group(1))
+        # nested imports are already included in the cumulative time of the outermost one
+        if len(match.group(3)) == 1:
+            cumulative_time[package] += int(match.group(2))
+    return wall_time, self_time, cumulative_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import time breakdown of the bot entry point.")
+    parser.add_argument("--budget", type=float, default=2.0, help="Maximum wall time in seconds.")
+    parser.add_argument("--top", type=int, default=20, help="Number of packages to list.")
+    parser.add_argument("--repeat", type=int, default=3, help="Take the best of this many runs.")
+    args = parser.parse_args()
+
+    wall_time, self_time, cumulative_time = min(
+        (measure_import() for _ in range(args.repeat)), key=lambda m: m[0]
+    )
+
+    print(f"{'package':<32}{'self [ms]':>12}{'cumulative [ms]':>18}")
+    for package, t in self_time.most_common(args.top):
+        print(f"{package:<32}{t / 1e3:>12.1f}{cumulative_time[package] / 1e3:>18.1f}")
+    print(f"total import time: {sum(self_time.values()) / 1e3:.1f}ms")
+    print(f"process wall time: {wall_time * 1e3:.1f}ms (budget {args.budget * 1e3:.0f}ms)")
+
+    if args.budget < wall_time:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()